@@ -1,3 +1,6 @@
+import heapq
+from collections import deque
+
 class Term:
     name = ""
     neg = False
@@ -34,10 +37,7 @@ class Clause:
         return other.c == self.c
 
     def __hash__(self):
-        string = ""
-        for t in self.c:
-            string += t.name
-        return hash(string)
+        return hash(frozenset(self.c))
 
     def __str__(self):
         string = "( "
@@ -57,49 +57,465 @@ class Clause:
             self.neg = not self.neg
 
 
+"------------------------------------------------------------------------------"
+# CDCL SAT solver on integer literals
+#
+# Variables are numbered from 1, the literal v means variable v is true and -v
+# that it is false. Every clause watches two of its literals, which are kept at
+# positions 0 and 1, and is only looked at when one of them becomes false. A
+# conflict is analysed back to the first unique implication point, the learnt
+# clause is added, and the search jumps back to the level where that clause
+# propagates. Decisions take the most active variable (VSIDS) with its saved
+# phase. Clauses can be added between calls to solve(), and solve() takes a list
+# of assumed literals, so the same solver can answer many queries.
+
+# conflicts before the first restart, every restart allows RESTART_GROWTH times more
+RESTART_FIRST = 100
+RESTART_GROWTH = 1.5
+# activity decay per conflict
+ACTIVITY_DECAY = 0.95
+
+class SatSolver:
+    # number of variables
+    numVars = 0
+    # clauses as lists of literals, the original ones followed by the learnt ones
+    clauses = None
+    # watches[lit] is the list of clauses watching lit, looked at when lit becomes false
+    watches = None
+    # value of each variable, 1 true, -1 false, 0 unassigned
+    values = None
+    # decision level and reason clause (None for decisions) of each assigned variable
+    levels = None
+    reasons = None
+    # assigned literals in order, and where each decision level starts in it
+    trail = None
+    trailLim = None
+    # next literal on the trail to propagate
+    qhead = 0
+    # VSIDS activity of each variable, the amount added by a bump, and a heap of (-activity, var)
+    activity = None
+    varInc = 1.0
+    order = None
+    # last value each variable had, decisions use it again
+    phase = None
+    # False once the clauses are unsatisfiable without any assumption
+    ok = True
+    # a satisfying assignment after solve() returned True, model[v] is True or False
+    model = None
+    # number of decisions, conflicts and restarts over all calls to solve()
+    decisions = 0
+    conflicts = 0
+    restarts = 0
+
+    def __init__(self, numVars = 0):
+        self.numVars = 0
+        self.clauses = []
+        self.watches = {}
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.trail = []
+        self.trailLim = []
+        self.qhead = 0
+        self.activity = [0.0]
+        self.varInc = 1.0
+        self.order = []
+        self.phase = [False]
+        self.ok = True
+        self.model = None
+        self.ensureVars(numVars)
+
+    # make room for variables up to n
+    def ensureVars(self, n):
+        while self.numVars < n:
+            self.numVars += 1
+            v = self.numVars
+            self.values.append(0)
+            self.levels.append(0)
+            self.reasons.append(None)
+            self.activity.append(0.0)
+            self.phase.append(False)
+            self.watches[v] = []
+            self.watches[-v] = []
+            heapq.heappush(self.order, (0.0, v))
+
+    # 1 if lit is true, -1 if it is false, 0 if it is unassigned
+    def litValue(self, lit):
+        if lit > 0:
+            return self.values[lit]
+        return -self.values[-lit]
+
+    def decisionLevel(self):
+        return len(self.trailLim)
+
+    # add a clause, returns False if the clauses became unsatisfiable
+    def addClause(self, lits):
+        if not self.ok:
+            return False
+        self.cancelUntil(0)
+        self.ensureVars(max(abs(lit) for lit in lits) if lits else 0)
+        clause = []
+        for lit in lits:
+            value = self.litValue(lit)
+            if value == 1 or -lit in clause:
+                # satisfied at the root, or always true
+                return True
+            if value == 0 and lit not in clause:
+                clause.append(lit)
+        if len(clause) == 0:
+            self.ok = False
+        elif len(clause) == 1:
+            self.enqueue(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.attach(clause)
+        return self.ok
+
+    # store a clause of at least two literals and watch its first two
+    def attach(self, clause):
+        self.clauses.append(clause)
+        index = len(self.clauses) - 1
+        self.watches[clause[0]].append(index)
+        self.watches[clause[1]].append(index)
+        return index
+
+    # make lit true, reason is the clause that implied it, None for a decision
+    def enqueue(self, lit, reason):
+        v = abs(lit)
+        self.values[v] = 1 if lit > 0 else -1
+        self.levels[v] = len(self.trailLim)
+        self.reasons[v] = reason
+        self.trail.append(lit)
+
+    # unit propagation over the watched literals, returns a conflicting clause or None
+    def propagate(self):
+        clauses = self.clauses
+        values = self.values
+        while self.qhead < len(self.trail):
+            lit = self.trail[self.qhead]
+            self.qhead += 1
+            falseLit = -lit
+            watching = self.watches[falseLit]
+            kept = []
+            i = 0
+            while i < len(watching):
+                index = watching[i]
+                i += 1
+                clause = clauses[index]
+                # keep the false literal at position 1
+                if clause[0] == falseLit:
+                    clause[0] = clause[1]
+                    clause[1] = falseLit
+                first = clause[0]
+                if (values[first] if first > 0 else -values[-first]) == 1:
+                    kept.append(index)
+                    continue
+                # look for a literal that is not false to watch instead
+                for k in range(2, len(clause)):
+                    other = clause[k]
+                    if (values[other] if other > 0 else -values[-other]) != -1:
+                        clause[1] = other
+                        clause[k] = falseLit
+                        self.watches[other].append(index)
+                        break
+                else:
+                    kept.append(index)
+                    if (values[first] if first > 0 else -values[-first]) == -1:
+                        kept.extend(watching[i:])
+                        self.watches[falseLit] = kept
+                        self.qhead = len(self.trail)
+                        return index
+                    self.enqueue(first, index)
+            self.watches[falseLit] = kept
+        return None
+
+    # undo every assignment above the given decision level
+    def cancelUntil(self, level):
+        if len(self.trailLim) <= level:
+            return
+        start = self.trailLim[level]
+        for lit in self.trail[start:]:
+            v = abs(lit)
+            self.phase[v] = lit > 0
+            self.values[v] = 0
+            self.reasons[v] = None
+            heapq.heappush(self.order, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.trailLim[level:]
+        self.qhead = start
+
+    def bumpActivity(self, v):
+        self.activity[v] += self.varInc
+        if self.activity[v] > 1e100:
+            # rescale everything before the numbers overflow
+            for i in range(1, self.numVars+1):
+                self.activity[i] *= 1e-100
+            self.varInc *= 1e-100
+            self.order = [(-self.activity[i], i) for i in range(1, self.numVars+1) if self.values[i] == 0]
+            heapq.heapify(self.order)
+        elif self.values[v] == 0:
+            heapq.heappush(self.order, (-self.activity[v], v))
+
+    # first unique implication point analysis of a conflicting clause,
+    # returns the learnt clause, asserting literal first, and the level to jump back to
+    def analyze(self, conflict):
+        seen = set()
+        learnt = [0]
+        level = len(self.trailLim)
+        pending = 0
+        lit = 0
+        index = len(self.trail) - 1
+        clause = self.clauses[conflict]
+        while True:
+            # a reason clause has its implied literal first, which is already resolved on
+            for other in (clause if lit == 0 else clause[1:]):
+                v = abs(other)
+                if v not in seen and self.levels[v] > 0:
+                    seen.add(v)
+                    self.bumpActivity(v)
+                    if self.levels[v] == level:
+                        pending += 1
+                    else:
+                        learnt.append(other)
+            # the next literal of this level on the trail that is part of the conflict
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            lit = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.clauses[self.reasons[abs(lit)]]
+        learnt[0] = -lit
+        # watch the literal of the highest level after the asserting one
+        backLevel = 0
+        for i in range(2, len(learnt)):
+            if self.levels[abs(learnt[i])] > self.levels[abs(learnt[1])]:
+                learnt[1], learnt[i] = learnt[i], learnt[1]
+        if len(learnt) > 1:
+            backLevel = self.levels[abs(learnt[1])]
+        return learnt, backLevel
+
+    # the unassigned variable with the highest activity, as a literal with its saved phase, 0 if none is left
+    def pickBranchLit(self):
+        while len(self.order) > 0:
+            activity, v = heapq.heappop(self.order)
+            if self.values[v] == 0 and -activity == self.activity[v]:
+                return v if self.phase[v] else -v
+        # stale heap entries can hide a variable, check them all before giving up
+        for v in range(1, self.numVars+1):
+            if self.values[v] == 0:
+                return v if self.phase[v] else -v
+        return 0
+
+    # search for an assignment that makes every clause and every assumed literal true,
+    # returns True and sets model if there is one, False otherwise
+    def solve(self, assumptions = ()):
+        self.model = None
+        if not self.ok:
+            return False
+        self.cancelUntil(0)
+        self.ensureVars(max((abs(lit) for lit in assumptions), default=0))
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+        restartLimit = RESTART_FIRST
+        conflictsLeft = restartLimit
+        try:
+            while True:
+                conflict = self.propagate()
+                if conflict is not None:
+                    self.conflicts += 1
+                    conflictsLeft -= 1
+                    if len(self.trailLim) == 0:
+                        self.ok = False
+                        return False
+                    learnt, backLevel = self.analyze(conflict)
+                    self.cancelUntil(backLevel)
+                    if len(learnt) == 1:
+                        self.enqueue(learnt[0], None)
+                    else:
+                        self.enqueue(learnt[0], self.attach(learnt))
+                    self.varInc /= ACTIVITY_DECAY
+                    continue
+                if conflictsLeft <= 0:
+                    self.restarts += 1
+                    restartLimit = int(restartLimit * RESTART_GROWTH)
+                    conflictsLeft = restartLimit
+                    self.cancelUntil(0)
+                    continue
+                if len(self.trailLim) < len(assumptions):
+                    # the assumptions are the first decisions
+                    lit = assumptions[len(self.trailLim)]
+                    value = self.litValue(lit)
+                    if value == -1:
+                        return False
+                    self.trailLim.append(len(self.trail))
+                    if value == 0:
+                        self.enqueue(lit, None)
+                    continue
+                lit = self.pickBranchLit()
+                if lit == 0:
+                    self.model = [False] + [value == 1 for value in self.values[1:]]
+                    return True
+                self.decisions += 1
+                self.trailLim.append(len(self.trail))
+                self.enqueue(lit, None)
+        finally:
+            self.cancelUntil(0)
+
+"------------------------------------------------------------------------------"
+# Clause sets indexed by literal
+#
+# Clauses are frozensets of integer literals, which are hashed once, and
+# occurs[lit] is the set of clauses containing lit. Clauses that resolve with a
+# clause on lit are then exactly occurs[-lit], and subsumption checks only look
+# at clauses sharing a literal with the clause at hand.
+
+def indexClause(clause, occurs):
+    for lit in clause:
+        occurs.setdefault(lit, set()).add(clause)
+
+def unindexClause(clause, occurs):
+    for lit in clause:
+        occurs[lit].discard(clause)
+
+# True if an indexed clause is a subset of clause
+def isSubsumed(clause, occurs):
+    for lit in clause:
+        for other in occurs.get(lit, ()):
+            if len(other) <= len(clause) and other <= clause:
+                return True
+    return False
+
+# the indexed clauses that contain every literal of a non-empty clause
+def subsumedClauses(clause, occurs):
+    smallest = min((occurs.get(lit, ()) for lit in clause), key=len)
+    return [other for other in smallest if other is not clause and clause <= other]
+
+# the resolvent of two clauses on lit, which is in c1 while -lit is in c2, None if it is always true
+def resolvent(c1, c2, lit):
+    clause = (c1 - {lit}) | (c2 - {-lit})
+    for other in clause:
+        if -other in clause:
+            return None
+    return clause
+
+"------------------------------------------------------------------------------"
+# Knowledge base of named propositional clauses
+#
+# Terms are mapped to solver variables by name, and every told clause goes
+# straight into a SatSolver. ask() checks entailment by refutation: the KB
+# entails a clause when the KB together with the negation of the clause,
+# which is one assumed literal per term, has no model. prove() answers the same
+# question by resolution, which is slower but only derives clauses that follow
+# from the query.
 class KB:
-    # a set of CNF clauses
-    kb = set()
+    # the told clauses as frozensets of integer literals, without subsumed ones
+    kb = None
+    # the told clauses containing each literal
+    occurs = None
+    # variable number of each term name, and the name of each variable number
+    variables = None
+    names = None
+    # the engine holding the told clauses
+    solver = None
+    # clauses derived by the last call to prove()
+    resolvents = 0
+
+    def __init__(self):
+        self.kb = set()
+        self.occurs = {}
+        self.variables = {}
+        self.names = [None]
+        self.solver = SatSolver()
+
+    # the integer literal of a term, a new variable is made for a new name
+    def literal(self, term):
+        v = self.variables.get(term.name)
+        if v is None:
+            v = len(self.names)
+            self.variables[term.name] = v
+            self.names.append(term.name)
+            self.solver.ensureVars(v)
+        return -v if term.neg else v
 
     def tell(self, clause):
+        lits = [self.literal(term) for term in clause.c]
+        if clause.neg:
+            # the negation of a disjunction is one negated term per clause
+            for lit in lits:
+                self.add(frozenset([-lit]))
+        else:
+            self.add(frozenset(lits))
+
+    # store a clause unless a told clause subsumes it, dropping the told clauses it subsumes
+    def add(self, clause):
+        if clause in self.kb or isSubsumed(clause, self.occurs):
+            return
+        if len(clause) > 0:
+            for other in subsumedClauses(clause, self.occurs):
+                self.kb.discard(other)
+                unindexClause(other, self.occurs)
         self.kb.add(clause)
+        indexClause(clause, self.occurs)
+        self.solver.addClause(list(clause))
 
+    # True if the clauses told so far entail clause
     def ask(self, clause):
-        # add the negation of the clause to the kb
-        clauses = set([i for i in self.kb])
-        clause.negate()
-        clauses.add(clause)
-        new = set()
-        
-        while True:
-            print(len(clauses))
-            for i in clauses:
-                for j in clauses:
-                    resolvent = self.resolve(i.c,j.c)
-                    if len(resolvent) == 1:
-                        if len(resolvent[0].c) == 0:
-                            return True
-                        else:
-                            new.add(resolvent[0])
-            if new.issubset(clauses):
-                return False
-            clauses = clauses.union(new)
-
-    def resolve(self, c1, c2):
-        count = 0
-        n1 = set([i for i in c1])
-        n2 = set([i for i in c2])
-                  
-        for t1 in c1:
-            for t2 in c2:
-                if t1.name == t2.name and t1.neg ^ t2.neg:
-                    count += 1
-                    n1.remove(t1)
-                    n2.remove(t2)
-        if count == 1:
-            return [Clause(n1.union(n2))]
+        lits = [self.literal(term) for term in clause.c]
+        if clause.neg:
+            # entails every negated term
+            return all(not self.solver.solve([lit]) for lit in lits)
+        return not self.solver.solve([-lit for lit in lits])
+
+    # True if the clauses told so far entail clause, found by resolution with the negated
+    # clause as the set of support: every resolvent has a parent derived from the query,
+    # so the work grows with the new clauses and not with the size of the KB, the told
+    # clauses are assumed to be consistent
+    def prove(self, clause):
+        lits = [self.literal(term) for term in clause.c]
+        if clause.neg:
+            support = [frozenset(lits)]
         else:
-            return []
+            support = [frozenset([-lit]) for lit in lits]
+        known = set(self.kb)
+        occurs = {lit: set(clauses) for lit, clauses in self.occurs.items()}
+        queue = deque()
+        self.resolvents = 0
+        for given in support:
+            if given not in known and not isSubsumed(given, occurs):
+                known.add(given)
+                indexClause(given, occurs)
+                queue.append(given)
+        while len(queue) > 0:
+            given = queue.popleft()
+            if given not in known:
+                # dropped by a clause that subsumes it
+                continue
+            for lit in given:
+                for other in list(occurs.get(-lit, ())):
+                    new = resolvent(given, other, lit)
+                    if new is None or new in known:
+                        continue
+                    if len(new) == 0:
+                        return True
+                    if isSubsumed(new, occurs):
+                        continue
+                    for old in subsumedClauses(new, occurs):
+                        known.discard(old)
+                        unindexClause(old, occurs)
+                    known.add(new)
+                    indexClause(new, occurs)
+                    queue.append(new)
+                    self.resolvents += 1
+        return False
+
+    # a model of the KB as a dict from term name to truth value, None if there is none
+    def model(self):
+        if not self.solver.solve():
+            return None
+        return {self.names[v]: self.solver.model[v] for v in range(1, len(self.names))}
 
 # --------------------------------TEST EXAMPLE---------------------------------------
 if __name__ == "__main__":
@@ -110,4 +526,5 @@ if __name__ == "__main__":
     kb.tell(Clause([Term("A",True)]))
 
     print( kb.ask(Clause([Term("C")])) )
+    print( kb.prove(Clause([Term("C")])) )
         
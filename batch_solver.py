@@ -0,0 +1,242 @@
+import time
+import argparse
+from multiprocessing import Pool
+import loader
+import geometry
+import sudoku_solver_nlxh
+import vector_engine
+import cnf_encoder
+
+"------------------------------------------------------------------------------"
+# solver classes that can be picked on the command line, they share the sudokuSolver interface
+ENGINES = {
+    "python": sudoku_solver_nlxh.sudokuSolver,
+    "numpy": vector_engine.VectorSolver,
+    "sat": cnf_encoder.CnfSolver,
+}
+
+"------------------------------------------------------------------------------"
+# Solves many boards one after another in the same process
+#
+# One sudokuSolver is created and reset() for every board of the same size, so
+# the Variable objects, geometry tables and queue are allocated once per batch
+# instead of once per puzzle.
+
+# the geometry of a board, from its size unless the box shape is given
+def boardGeometry(board, p = None, q = None):
+    if p is None:
+        return geometry.geometryForSize(len(board))
+    return geometry.getGeometry(p, q)
+
+# (board, p, q) of an item of a board iterable, which is either a board or a
+# (board, p, q) tuple as loader.readPuzzles yields them, p and q are the defaults
+def puzzleShape(item, p = None, q = None):
+    if isinstance(item, tuple):
+        return item
+    return item, p, q
+
+# stats for the board the solver just finished
+def solverStats(solver, startTime):
+    return {"time": time.time() - startTime,
+            "guesses": solver.guesses,
+            "backtracks": solver.backtracks}
+
+# solves one board, reusing solver when it has the right box shape and class,
+# returns the solver to use for the next board, the solution and the stats
+def solveOne(solver, board, comparator, p = None, q = None, solverClass = sudoku_solver_nlxh.sudokuSolver):
+    startTime = time.time()
+    if solver is None or solver.geometry is not boardGeometry(board, p, q) or type(solver) is not solverClass:
+        solver = solverClass(board, len(board), comparator, p, q)
+    else:
+        solver.reset(board)
+    solver.setDomains()
+    if solver.solve() is not None:
+        return solver, solver.getValues(), solverStats(solver, startTime)
+    return solver, None, solverStats(solver, startTime)
+
+# solves every board of an iterable and yields (solution, stats) as each one completes,
+# solution is the board as a 2 dimensional list of values or None if it has no solution,
+# the iterable can also hold (board, p, q) tuples for boards with their own box shape
+def solveMany(boards, comparator = sudoku_solver_nlxh.leastConstrainingValue, p = None, q = None,
+              solverClass = sudoku_solver_nlxh.sudokuSolver):
+    solver = None
+    for item in boards:
+        board, boardP, boardQ = puzzleShape(item, p, q)
+        solver, solution, stats = solveOne(solver, board, comparator, boardP, boardQ, solverClass)
+        yield solution, stats
+
+"------------------------------------------------------------------------------"
+# Solves many boards on a pool of worker processes
+#
+# Boards are sent to the workers in chunks to keep the messaging overhead low.
+# Each worker keeps its modules, geometry tables and solver between chunks.
+
+# state kept by each pool worker
+workerSolver = None
+workerComparator = None
+workerShape = (None, None)
+workerClass = None
+
+def initWorker(comparator, p, q, solverClass):
+    global workerComparator, workerShape, workerClass
+    workerComparator = comparator
+    workerShape = (p, q)
+    workerClass = solverClass
+    # build the geometry tables once, before the first chunk arrives
+    if p is not None:
+        geometry.getGeometry(p, q)
+
+# solves a chunk of (index, board) pairs, where a board can also be a (board, p, q) tuple,
+# and returns (index, solution, stats) for each
+def solveChunk(chunk):
+    global workerSolver
+    results = []
+    for index, item in chunk:
+        board, p, q = puzzleShape(item, *workerShape)
+        workerSolver, solution, stats = solveOne(workerSolver, board, workerComparator, p, q, workerClass)
+        results.append((index, solution, stats))
+    return results
+
+# groups an iterable into lists of chunkSize items
+def chunks(iterable, chunkSize):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+# runs worker on every chunk of (index, board) pairs on a pool of processes and yields
+# the (index, solution, stats) results, in input order unless ordered is False
+def poolResults(worker, boards, processes, chunkSize, ordered, comparator, p, q, solverClass):
+    with Pool(processes, initializer=initWorker, initargs=(comparator, p, q, solverClass)) as pool:
+        work = chunks(enumerate(boards), chunkSize)
+        if ordered:
+            results = pool.imap(worker, work)
+        else:
+            results = pool.imap_unordered(worker, work)
+        for chunk in results:
+            for result in chunk:
+                yield result
+
+# solves every board (or (board, p, q) tuple) of an iterable on a pool of processes
+# (one per core by default), yields (index, solution, stats) in input order, or in completion order when ordered is False
+def solveManyParallel(boards, processes = None, chunkSize = 16, ordered = True,
+                      comparator = sudoku_solver_nlxh.leastConstrainingValue, p = None, q = None,
+                      solverClass = sudoku_solver_nlxh.sudokuSolver):
+    return poolResults(solveChunk, boards, processes, chunkSize, ordered, comparator, p, q, solverClass)
+
+"------------------------------------------------------------------------------"
+# Propagates many boards at once before searching
+#
+# Boards are stacked batchSize at a time into one NumPy candidate array and
+# propagated together, so the interpreter overhead is paid once per batch. Only
+# the boards that propagation does not finish go to the backtracking solver.
+
+# propagates the boards of the same size and box shape in a chunk together and solves the rest,
+# returns (solution, stats) for every board (or (board, p, q) tuple) of the chunk in order
+def solveBatch(chunk, comparator, p = None, q = None, solverClass = sudoku_solver_nlxh.sudokuSolver):
+    results = [None for item in chunk]
+    puzzles = [puzzleShape(item, p, q) for item in chunk]
+    shapes = {}
+    for i, (board, boardP, boardQ) in enumerate(puzzles):
+        g = boardGeometry(board, boardP, boardQ)
+        shapes.setdefault((g.size, g.p, g.q), []).append(i)
+    solver = None
+    for (size, boardP, boardQ), indices in shapes.items():
+        startTime = time.time()
+        g = geometry.getGeometry(boardP, boardQ)
+        values, solved, error = vector_engine.propagateBoards([puzzles[i][0] for i in indices], g)
+        # the stacked propagation is shared by every board of the batch
+        share = (time.time() - startTime) / len(indices)
+        for i, board, isSolved, isError in zip(indices, values, solved, error):
+            if isSolved or isError:
+                stats = {"time": share, "guesses": 0, "backtracks": 0}
+                results[i] = (board if isSolved else None, stats)
+            else:
+                solver, solution, stats = solveOne(solver, board, comparator, boardP, boardQ, solverClass)
+                stats["time"] += share
+                results[i] = (solution, stats)
+    return results
+
+# solves every board (or (board, p, q) tuple) of an iterable, propagating batchSize boards at a time with NumPy,
+# yields (solution, stats) in input order
+def solveManyBatched(boards, batchSize = 64, comparator = sudoku_solver_nlxh.leastConstrainingValue,
+                     p = None, q = None, solverClass = sudoku_solver_nlxh.sudokuSolver):
+    if vector_engine.numpy is None:
+        raise ImportError("the vectorized engine needs numpy")
+    for chunk in chunks(boards, batchSize):
+        for result in solveBatch(chunk, comparator, p, q, solverClass):
+            yield result
+
+# solves a chunk of (index, board) pairs as one batch in a pool worker,
+# and returns (index, solution, stats) for each
+def solveBatchChunk(chunk):
+    results = solveBatch([item for index, item in chunk], workerComparator, *workerShape, workerClass)
+    return [(index, solution, stats) for (index, item), (solution, stats) in zip(chunk, results)]
+
+# solveManyBatched on a pool of processes (one per core by default), every worker propagates
+# and solves batchSize boards at a time, yields (index, solution, stats) in input order,
+# or in completion order when ordered is False
+def solveManyBatchedParallel(boards, batchSize = 64, processes = None, ordered = True,
+                             comparator = sudoku_solver_nlxh.leastConstrainingValue, p = None, q = None,
+                             solverClass = sudoku_solver_nlxh.sudokuSolver):
+    if vector_engine.numpy is None:
+        raise ImportError("the vectorized engine needs numpy")
+    return poolResults(solveBatchChunk, boards, processes, batchSize, ordered, comparator, p, q, solverClass)
+
+"------------------------------------------------------------------------------"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve many sudoku boards")
+    parser.add_argument("size", type=int, help="1 dimensional size of the boards")
+    parser.add_argument("files", nargs="+", help="board files")
+    parser.add_argument("-j", "--processes", type=int, default=1,
+                        help="number of worker processes, 0 for one per core (default 1, no pool)")
+    parser.add_argument("-c", "--chunk", type=int, default=None,
+                        help="boards sent to a worker at a time (default 16, with -b every worker gets one batch)")
+    parser.add_argument("-u", "--unordered", action="store_true", help="report boards as they complete")
+    parser.add_argument("-b", "--batch", type=int, default=0,
+                        help="propagate this many boards at a time with NumPy before searching (default 0, off)")
+    parser.add_argument("-s", "--stream", action="store_true",
+                        help="every file holds many puzzles, as grids or one per line, possibly gzipped, "
+                             "with the size of each puzzle detected (SIZE is not used)")
+    parser.add_argument("-e", "--engine", choices=sorted(ENGINES), default="python",
+                        help="solver to use, numpy needs NumPy installed, sat encodes the boards as CNF (default python)")
+    args = parser.parse_args()
+    if args.batch > 0 and args.chunk is not None:
+        parser.error("-c cannot be used with -b, the batch size is the number of boards sent to a worker")
+
+    if args.stream:
+        boards = loader.readPuzzleFiles(args.files)
+    else:
+        boards = loader.loadFiles(args.files, args.size)
+    solverClass = ENGINES[args.engine]
+    if args.batch > 0 and args.processes == 1:
+        results = ((i, solution, stats) for i, (solution, stats)
+                   in enumerate(solveManyBatched(boards, args.batch, solverClass=solverClass)))
+    elif args.batch > 0:
+        results = solveManyBatchedParallel(boards, args.batch, args.processes or None, not args.unordered,
+                                           solverClass=solverClass)
+    elif args.processes == 1:
+        results = ((i, solution, stats) for i, (solution, stats)
+                   in enumerate(solveMany(boards, solverClass=solverClass)))
+    else:
+        results = solveManyParallel(boards, args.processes or None, args.chunk or 16, not args.unordered,
+                                    solverClass=solverClass)
+
+    count = 0
+    unsolved = 0
+    startTime = time.time()
+    for index, solution, stats in results:
+        count += 1
+        if solution is None:
+            unsolved += 1
+        print("%s: %s in %.3f seconds, %d guesses, %d backtracks" % (
+            "puzzle %d" % index if args.stream else args.files[index], "solved" if solution is not None else "no solution",
+            stats["time"], stats["guesses"], stats["backtracks"]))
+    endTime = time.time() - startTime
+    print("%d puzzles (%d without solution) in %.3f seconds, %.1f puzzles/second" % (
+        count, unsolved, endTime, count / endTime if endTime > 0 else 0))
@@ -1,27 +1,7 @@
 import sys
 import random
-
-def isValidValue(row, col, value, p, q, N, board ):
-    # check whether current value can be assigned to current variable
-    return isValidColValue(col, value, p, q, N, board) and isValidRowValue(row, value, p, q, N, board) and isValidBlock(row, col, value, p, q, N, board)
-
-
-def isValidColValue(col, value, p, q, N, board):
-    return value not in [board[v][col] for v in range(N)]
-
-
-def isValidRowValue(row, value, p, q, N, board):
-    return value not in [board[row][v] for v in range(N)]
-
-
-def isValidBlock(row, col, value, p, q, N, board):
-    rDiv = row // p;
-    cDiv = col // q;
-    for i in range(rDiv * p, (rDiv + 1) * p):
-        for j in range(cDiv * q, (cDiv + 1) * q):
-            if board[i][j] == value:
-                return False
-    return True
+import geometry
+import corpus
 
 def intToOdometer ( n ):
     alphabet='0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
@@ -36,21 +16,61 @@ def intToOdometer ( n ):
 
     return toReturn
 
-def genBoard ( p, q, m, filename ):
-    N = p*q
-    board = [[0 for j in range(N)] for i in range(N)]
+# a board with m random values that do not conflict, 0 for empty cells
+#
+# Every row, column and box keeps the values it uses as a bitset, so the legal
+# values of a cell are one mask operation away. A value is only ever drawn from
+# the legal values of a cell, and a cell without legal values is dropped for
+# good, since the used sets only grow. When no cell is left before m values are
+# placed, the board starts over.
+def makeBoard ( p, q, m, rng = random ):
+    g = geometry.getGeometry(p, q)
+    N = g.size
+    if m > g.cellCount:
+        raise ValueError("a " + str(N) + "x" + str(N) + " board has no room for " + str(m) + " values")
+    allValues = ((1 << N) - 1) << 1
 
     while True:
-        if m <= 0:
-            break
+        values = [0] * g.cellCount
+        rowUsed = [0] * N
+        colUsed = [0] * N
+        boxUsed = [0] * N
+        # empty cells that may still have a legal value
+        openCells = list(range(g.cellCount))
+        placed = 0
+        while placed < m and len(openCells) > 0:
+            pos = rng.randrange(len(openCells))
+            cell = openCells[pos]
+            # the cell is filled or has no legal value either way, so take it out
+            openCells[pos] = openCells[-1]
+            openCells.pop()
+            row, col, box = g.rowOf[cell], g.colOf[cell], g.boxOf[cell]
+            legal = allValues & ~(rowUsed[row] | colUsed[col] | boxUsed[box])
+            if legal == 0:
+                continue
+            # the k-th legal value
+            for k in range(rng.randrange(legal.bit_count())):
+                legal &= legal - 1
+            bit = legal & -legal
+            values[cell] = bit.bit_length() - 1
+            rowUsed[row] |= bit
+            colUsed[col] |= bit
+            boxUsed[box] |= bit
+            placed += 1
+        if placed == m:
+            return [values[x*N:(x+1)*N] for x in range(N)]
+
+# yields count boards, the same ones every time for the same seed
+def makeBoards ( p, q, m, count, seed = None ):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield makeBoard( p, q, m, rng )
 
-        randomRow = random.randint(0, N-1)
-        randomCol = random.randint(0, N-1)
-        randomAssignment = random.randint(1, N)
-        if board[randomRow][randomCol] == 0 and isValidValue( randomRow, randomCol, randomAssignment, p, q, N, board ):
-            board[randomRow][randomCol] = randomAssignment
-            m -= 1
+def genBoard ( p, q, m, filename ):
+    writeBoard( makeBoard( p, q, m ), filename )
 
+def writeBoard ( board, filename ):
+    N = len(board)
     file = open(filename, "w")
     #file.write( str(p) + " " + str(q) + "\n" )
     for i in range(N):
@@ -61,20 +81,32 @@ def genBoard ( p, q, m, filename ):
     file.close();
 
 
-if len(sys.argv) != 6:
-    #print ( "Usage: Board_Generator Base_File_Name #ofBoards p q m" )
-    baseFileName = input("base file name: ")
-    numOfFiles = int(input("number of files: "))
-    p = int(input("p: "))
-    q = int(input("q: "))
-    m = int(input("m: "))
-else:
-    baseFileName = sys.argv[1]
-    numOfFiles = int(sys.argv[2])
-    p = int(sys.argv[3])
-    q = int(sys.argv[4])
-    m = int(sys.argv[5])
-
-for i in range(numOfFiles):
-    print ( "Creating world number: " + str(i) + "." )
-    genBoard( p, q, m, baseFileName + "_" + str(i) + ".txt" )
+if __name__ == "__main__":
+    seed = None
+    if len(sys.argv) not in (6, 7):
+        #print ( "Usage: Board_Generator Base_File_Name #ofBoards p q m [seed]" )
+        baseFileName = input("base file name: ")
+        numOfFiles = int(input("number of files: "))
+        p = int(input("p: "))
+        q = int(input("q: "))
+        m = int(input("m: "))
+    else:
+        baseFileName = sys.argv[1]
+        numOfFiles = int(sys.argv[2])
+        p = int(sys.argv[3])
+        q = int(sys.argv[4])
+        m = int(sys.argv[5])
+        if len(sys.argv) == 7:
+            seed = int(sys.argv[6])
+
+    boards = makeBoards( p, q, m, numOfFiles, seed )
+    if baseFileName.endswith(corpus.SUFFIX):
+        # every board goes into one binary corpus file
+        with corpus.CorpusWriter(baseFileName) as out:
+            for board in boards:
+                out.add( board, p, q )
+        print ( "Created " + str(numOfFiles) + " worlds in " + baseFileName + "." )
+    else:
+        for i, board in enumerate(boards):
+            print ( "Creating world number: " + str(i) + "." )
+            writeBoard( board, baseFileName + "_" + str(i) + ".txt" )
@@ -0,0 +1,236 @@
+import sys
+import os
+import subprocess
+import tempfile
+import loader
+import geometry
+import KB
+import sudoku_solver_nlxh
+
+"------------------------------------------------------------------------------"
+# Sudoku as a CNF formula
+#
+# The variable for "cell i has value v" is i*size + v, so an N x N board uses
+# the variables 1 to N^3 and every (cell, value) pair has its own number. Each
+# cell has exactly one value, and each row, column and box has every value
+# exactly once. Exactly one is an at-least-one clause plus a negative clause
+# for every pair (pairwise at-most-one). When the candidate domains are known,
+# literals for values a cell cannot have are left out of every clause.
+
+# the CNF variable for value val in cell i
+def cnfVariable(g, i, val):
+    return i*g.size + val
+
+# the (cell index, value) pair of a CNF variable
+def cellValue(g, var):
+    i, val = divmod(var - 1, g.size)
+    return i, val + 1
+
+# candidate domains of a board as bitmasks, bit v is set when the cell can be v,
+# fixed cells only allow their value and empty cells allow everything
+def boardDomains(board, g):
+    allValues = ((1 << g.size) - 1) << 1
+    return [allValues if board[x][y] == sudoku_solver_nlxh.EMPTY else 1 << board[x][y]
+            for x, y in g.positions]
+
+# clauses saying that exactly one of the literals is true
+def exactlyOne(lits, clauses):
+    clauses.append(lits)
+    for a in range(len(lits)):
+        for b in range(a+1, len(lits)):
+            clauses.append([-lits[a], -lits[b]])
+
+# encodes a board of geometry g, returns (number of variables, clauses), domains is a list
+# of bitmasks per cell, for example from sudokuSolver.setDomains, and prunes the literals
+# of values a cell cannot have, boardDomains(board, g) is used when it is None
+def encodeBoard(board, g, domains = None):
+    if domains is None:
+        domains = boardDomains(board, g)
+    clauses = []
+    for i in range(g.cellCount):
+        exactlyOne([cnfVariable(g, i, val) for val in sudoku_solver_nlxh.domainValues(domains[i])], clauses)
+    for unit in g.units:
+        for val in range(1, g.size+1):
+            bit = 1 << val
+            exactlyOne([cnfVariable(g, i, val) for i in unit if domains[i] & bit], clauses)
+    return g.cellCount*g.size, clauses
+
+# the board of a model, model[v] is the truth value of variable v, only the
+# literals allowed by domains are read since the pruned ones are in no clause
+def decodeModel(model, g, domains):
+    values = [[sudoku_solver_nlxh.EMPTY for y in range(g.size)] for x in range(g.size)]
+    for i in range(g.cellCount):
+        for val in sudoku_solver_nlxh.domainValues(domains[i]):
+            if model[cnfVariable(g, i, val)]:
+                x, y = g.positions[i]
+                values[x][y] = val
+                break
+    return values
+
+# writes the clauses to a file object in DIMACS CNF format
+def writeDimacs(out, numVars, clauses, comments = ()):
+    for comment in comments:
+        out.write("c %s\n" % comment)
+    out.write("p cnf %d %d\n" % (numVars, len(clauses)))
+    for clause in clauses:
+        out.write(" ".join(map(str, clause)))
+        out.write(" 0\n")
+
+"------------------------------------------------------------------------------"
+# SAT backends
+#
+# A backend has solve(numVars, clauses), which returns a model as a list of
+# truth values indexed by variable (index 0 is unused), or None when there is
+# none, and the decisions and conflicts of the last call.
+
+# solves in the same process with the CDCL engine of KB
+class InProcessBackend:
+    # decisions and conflicts of the last call
+    decisions = 0
+    conflicts = 0
+
+    def solve(self, numVars, clauses):
+        solver = KB.SatSolver(numVars)
+        for clause in clauses:
+            if not solver.addClause(clause):
+                break
+        found = solver.solve()
+        self.decisions = solver.decisions
+        self.conflicts = solver.conflicts
+        return solver.model if found else None
+
+# runs a solver program on a DIMACS file and reads its answer in the usual
+# "s SATISFIABLE" / "v 1 -2 ... 0" output format, for example ["kissat", "-q"]
+class ExternalBackend:
+    # the command line, the DIMACS file name is appended to it
+    command = None
+    # the output format has no decision and conflict counts, so these stay 0
+    decisions = 0
+    conflicts = 0
+
+    def __init__(self, command):
+        self.command = list(command)
+
+    def solve(self, numVars, clauses):
+        with tempfile.NamedTemporaryFile("w", suffix=".cnf", delete=False) as out:
+            writeDimacs(out, numVars, clauses)
+        try:
+            result = subprocess.run(self.command + [out.name], capture_output=True, text=True)
+        finally:
+            os.remove(out.name)
+        model = [False for v in range(numVars+1)]
+        status = None
+        for line in result.stdout.splitlines():
+            if line.startswith("s "):
+                status = line[2:].strip()
+            elif line.startswith("v "):
+                for lit in map(int, line.split()[1:]):
+                    if lit > 0:
+                        model[lit] = True
+        if status == "UNSATISFIABLE":
+            return None
+        # UNKNOWN after a time or memory limit says nothing about the board
+        if status != "SATISFIABLE":
+            raise RuntimeError("%s gave no answer (%s): %s" % (self.command[0], status or "no status line",
+                                                               result.stderr.strip()))
+        return model
+
+"------------------------------------------------------------------------------"
+# Solves boards through a SAT backend
+#
+# setDomains() runs the domain setup of sudokuSolver and the encoding leaves out
+# every literal it ruled out. guesses and backtracks report the decisions and
+# conflicts of the backend.
+class CnfSolver:
+    # the 1 dimensional size of the board
+    size = 0
+    # precomputed box shape for this board size
+    geometry = None
+    # the board to solve as a 2 dimensional list of values
+    board = None
+    # the backend that solves the formulas
+    backend = None
+    # when True, the literals ruled out by setDomains are left out of the formula
+    prune = True
+    # sudokuSolver used for its domains, kept between boards
+    domainSolver = None
+    # candidate domain of every cell as a bitmask, set by setDomains
+    domains = None
+    # the solved values
+    solution = None
+    # decisions and conflicts of the backend for the current board
+    guesses = 0
+    backtracks = 0
+
+    def __init__(self, board, size, comparator = None, p = None, q = None, backend = None, prune = True):
+        self.size = size
+        self.prune = prune
+        self.backend = backend if backend is not None else InProcessBackend()
+        if p is None:
+            self.geometry = geometry.geometryForSize(size)
+        else:
+            self.geometry = geometry.getGeometry(p, q)
+        self.reset(board)
+
+    # load a new board, call setDomains() and solve() afterwards as for a new solver
+    def reset(self, board):
+        self.board = board
+        self.domains = None
+        self.solution = None
+        self.guesses = 0
+        self.backtracks = 0
+
+    def setDomains(self):
+        if not self.prune:
+            self.domains = boardDomains(self.board, self.geometry)
+            return
+        g = self.geometry
+        if self.domainSolver is None:
+            self.domainSolver = sudoku_solver_nlxh.sudokuSolver(self.board, self.size, None, g.p, g.q)
+        else:
+            self.domainSolver.reset(self.board)
+        self.domainSolver.setDomains()
+        self.domains = [var.domain if var.value == sudoku_solver_nlxh.EMPTY else 1 << var.value
+                        for var in self.domainSolver.cells]
+
+    # returns the solved values, or None if the board has no solution
+    def solve(self):
+        numVars, clauses = encodeBoard(self.board, self.geometry, self.domains)
+        model = self.backend.solve(numVars, clauses)
+        self.guesses = self.backend.decisions
+        self.backtracks = self.backend.conflicts
+        if model is None:
+            return None
+        self.solution = decodeModel(model, self.geometry, self.domains)
+        return self.solution
+
+    # returns the values on the board as a 2 dimensional list
+    def getValues(self):
+        if self.solution is not None:
+            return [row[:] for row in self.solution]
+        return [row[:] for row in self.board]
+
+"------------------------------------------------------------------------------"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: cnf_encoder.py SIZE FILE [OUT.cnf]")
+        exit(1)
+    SIZE = int(sys.argv[1])
+    board = loader.Loader(SIZE, [])
+    board.loadFromFile(sys.argv[2])
+
+    solver = CnfSolver(board.data, SIZE)
+    solver.setDomains()
+    if len(sys.argv) > 3:
+        numVars, clauses = encodeBoard(board.data, solver.geometry, solver.domains)
+        with open(sys.argv[3], "w") as out:
+            writeDimacs(out, numVars, clauses, ["sudoku %s, variable i*%d + v means cell i holds v - 1" % (sys.argv[2], SIZE)])
+        print("%d variables, %d clauses written to %s" % (numVars, len(clauses), sys.argv[3]))
+        exit(0)
+    if solver.solve() is None:
+        print("No solution!")
+        exit(1)
+    print("Solved! %d decisions, %d conflicts" % (solver.guesses, solver.backtracks))
+    for row in solver.getValues():
+        print(" ".join(str(value - 1) for value in row))
@@ -0,0 +1,169 @@
+import sys
+import mmap
+import struct
+import geometry
+import loader
+
+"------------------------------------------------------------------------------"
+# Binary puzzle corpus
+#
+# A corpus file holds many puzzles as fixed-size binary records, one per puzzle:
+# N, p and q as one byte each, followed by the N*N cell values (0 for empty,
+# 1 to N as stored in a board) packed at N.bit_length() bits per cell, little
+# endian, row by row. All records of the same size have the same length. The
+# file starts with a header (magic, version, puzzle count, index offset), and
+# the index at the end of the file holds the offset of every record, so a
+# puzzle is fetched through mmap by its number without reading anything else.
+
+MAGIC = b"SDKC"
+VERSION = 1
+# magic, version, puzzle count, offset of the index
+HEADER = struct.Struct("<4sIIQ")
+# N, p, q of a record
+RECORD = struct.Struct("<BBB")
+# offset of one record in the index
+OFFSET = struct.Struct("<Q")
+# file name extension of corpus files
+SUFFIX = ".corpus"
+
+# bits per cell and record length in bytes for a board of the given size
+def recordLayout(size):
+    bits = size.bit_length()
+    return bits, RECORD.size + (bits*size*size + 7) // 8
+
+# packs a board into a record
+def packBoard(board, p, q):
+    size = len(board)
+    bits, length = recordLayout(size)
+    packed = 0
+    shift = 0
+    for row in board:
+        for value in row:
+            packed |= value << shift
+            shift += bits
+    return RECORD.pack(size, p, q) + packed.to_bytes(length - RECORD.size, "little")
+
+# (byte, shift) of every cell in a record of the given size, a cell never spans more
+# than two bytes, since at most 8 bits are used per cell
+cellLayouts = {}
+
+def cellLayout(size):
+    if size not in cellLayouts:
+        bits = size.bit_length()
+        cellLayouts[size] = [(offset >> 3, offset & 7) for offset in range(0, bits*size*size, bits)]
+    return cellLayouts[size]
+
+# unpacks the record at offset of a buffer, returns (board, p, q)
+def unpackBoard(buffer, offset):
+    size, p, q = RECORD.unpack_from(buffer, offset)
+    bits, length = recordLayout(size)
+    data = buffer[offset + RECORD.size:offset + length] + b"\0"
+    mask = (1 << bits) - 1
+    values = [(data[byte] | data[byte+1] << 8) >> shift & mask for byte, shift in cellLayout(size)]
+    return [values[x*size:(x+1)*size] for x in range(size)], p, q
+
+"------------------------------------------------------------------------------"
+# writes puzzles to a corpus file, use as a context manager or call close()
+class CorpusWriter:
+    # the open file
+    file = None
+    # offset of every record written so far
+    offsets = None
+
+    def __init__(self, filename):
+        self.file = open(filename, "wb")
+        self.offsets = []
+        # the header is written again with the real count on close()
+        self.file.write(HEADER.pack(MAGIC, VERSION, 0, 0))
+
+    # adds a board, with the most square box shape for its size unless p and q are given
+    def add(self, board, p = None, q = None):
+        if p is None:
+            p, q = geometry.boxShape(len(board))
+        self.offsets.append(self.file.tell())
+        self.file.write(packBoard(board, p, q))
+
+    def close(self):
+        indexOffset = self.file.tell()
+        for offset in self.offsets:
+            self.file.write(OFFSET.pack(offset))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(MAGIC, VERSION, len(self.offsets), indexOffset))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# writes (board, p, q) puzzles, for example from loader.readPuzzles, to a corpus file
+def writeCorpus(filename, puzzles):
+    with CorpusWriter(filename) as out:
+        for board, p, q in puzzles:
+            out.add(board, p, q)
+
+"------------------------------------------------------------------------------"
+# random access to the puzzles of a corpus file through mmap,
+# corpus[i] is the board of puzzle i and corpus.puzzle(i) is (board, p, q)
+class Corpus:
+    # the mapped file
+    buffer = None
+    # number of puzzles and where their offsets are
+    count = 0
+    indexOffset = 0
+
+    def __init__(self, filename):
+        with open(filename, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.indexOffset = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise loader.WrongDimentions(f"{filename} is not a version {VERSION} puzzle corpus")
+
+    def __len__(self):
+        return self.count
+
+    def puzzle(self, index):
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("puzzle index out of range")
+        offset, = OFFSET.unpack_from(self.buffer, self.indexOffset + index*OFFSET.size)
+        return unpackBoard(self.buffer, offset)
+
+    def __getitem__(self, index):
+        return self.puzzle(index)[0]
+
+    # yields (board, p, q) for every puzzle in order
+    def puzzles(self):
+        for i in range(self.count):
+            yield self.puzzle(i)
+
+    def __iter__(self):
+        for board, p, q in self.puzzles():
+            yield board
+
+    def close(self):
+        self.buffer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# True if the file starts like a corpus file
+def isCorpus(filename):
+    with open(filename, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+"------------------------------------------------------------------------------"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: corpus.py OUT%s FILE [FILE ...]" % SUFFIX)
+        exit(1)
+    writeCorpus(sys.argv[1], (puzzle for filename in sys.argv[2:] for puzzle in loader.readPuzzles(filename)))
+    with Corpus(sys.argv[1]) as corpus:
+        print("%d puzzles written to %s" % (len(corpus), sys.argv[1]))
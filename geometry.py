@@ -0,0 +1,85 @@
+import math
+
+"------------------------------------------------------------------------------"
+# Board geometry shared by all the solvers
+#
+# Cells are numbered with a flat index x*size + y, where x is the row and y the
+# column of board[x][y]. Boxes are p rows high and q columns wide, so a board
+# has size = p*q rows, columns and boxes. Everything is computed once per (p, q)
+# and the solvers iterate the precomputed tuples instead of doing arithmetic.
+class Geometry:
+    # box height and width
+    p = 0
+    q = 0
+    # the 1 dimensional size of the board
+    size = 0
+    # number of cells on the board
+    cellCount = 0
+    # (x, y) position of every cell
+    positions = ()
+    # row, column and box number of every cell
+    rowOf = ()
+    colOf = ()
+    boxOf = ()
+    # cells of every row, column and box
+    rows = ()
+    cols = ()
+    boxes = ()
+    # all units, rows first, then columns, then boxes
+    units = ()
+    # unit numbers (row, column, box) of every cell
+    unitsOf = ()
+    # every other cell sharing a unit with the cell
+    peers = ()
+
+    def __init__(self, p, q):
+        self.p = p
+        self.q = q
+        self.size = p*q
+        self.cellCount = self.size*self.size
+        size = self.size
+        self.positions = tuple((i // size, i % size) for i in range(self.cellCount))
+        self.rowOf = tuple(x for x, y in self.positions)
+        self.colOf = tuple(y for x, y in self.positions)
+        self.boxOf = tuple((x // p)*p + y // q for x, y in self.positions)
+        self.rows = tuple(tuple(x*size + y for y in range(size)) for x in range(size))
+        self.cols = tuple(tuple(x*size + y for x in range(size)) for y in range(size))
+        boxes = [[] for i in range(size)]
+        for i in range(self.cellCount):
+            boxes[self.boxOf[i]].append(i)
+        self.boxes = tuple(tuple(box) for box in boxes)
+        self.units = self.rows + self.cols + self.boxes
+        self.unitsOf = tuple((self.rowOf[i], size + self.colOf[i], 2*size + self.boxOf[i])
+                             for i in range(self.cellCount))
+        peers = []
+        for i in range(self.cellCount):
+            cells = set(self.rows[self.rowOf[i]])
+            cells.update(self.cols[self.colOf[i]])
+            cells.update(self.boxes[self.boxOf[i]])
+            cells.discard(i)
+            peers.append(tuple(sorted(cells)))
+        self.peers = tuple(peers)
+
+    # flat index of the cell in row x, column y
+    def index(self, x, y):
+        return x*self.size + y
+
+"------------------------------------------------------------------------------"
+# one Geometry per (p, q), built the first time it is asked for
+geometryCache = {}
+
+def getGeometry(p, q):
+    if (p, q) not in geometryCache:
+        geometryCache[(p, q)] = Geometry(p, q)
+    return geometryCache[(p, q)]
+
+# box height and width for a board of the given size when only the size is known,
+# square boxes when size is a perfect square, otherwise the most square p x q split
+def boxShape(size):
+    p = int(math.sqrt(size))
+    while size % p != 0:
+        p -= 1
+    return p, size // p
+
+def geometryForSize(size):
+    return getGeometry(*boxShape(size))
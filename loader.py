@@ -1,5 +1,9 @@
 import sys
 import re
+import gzip
+import math
+import geometry
+import corpus
 
 class WrongDimentions(Exception):
 	pass
@@ -39,3 +43,93 @@ class Loader:
 		return self.data[key]
 
 
+# yields the boards of several files one after another
+def loadFiles(filenames, size):
+	for filename in filenames:
+		l = Loader(size, [])
+		l.loadFromFile(filename)
+		yield l.data
+
+
+# symbols of the one puzzle per line format, the i-th symbol is the value i+1 as it
+# is stored in a board, and '.' or '0' is an empty cell, so 9x9 puzzles use 1-9,
+# 16x16 puzzles 1-9A-G and 25x25 puzzles 1-9A-P
+SYMBOLS = "123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+symbolValues = {c: i+1 for i, c in enumerate(SYMBOLS)}
+symbolValues["."] = 0
+symbolValues["0"] = 0
+
+# opens a text file for reading, gzip compressed files are recognized by their first bytes
+def openText(filename):
+	with open(filename, 'rb') as f:
+		magic = f.read(2)
+	if magic == b'\x1f\x8b':
+		return gzip.open(filename, 'rt')
+	return open(filename, 'r')
+
+# board of a puzzle written on one line, one symbol per cell
+def parseLine(line):
+	size = math.isqrt(len(line))
+	if size*size != len(line):
+		raise WrongDimentions(f"Wrong dimentions. A puzzle line needs a square number of cells, got {len(line)}")
+	try:
+		values = [symbolValues[c] for c in line]
+	except KeyError as e:
+		raise WrongDimentions(f"Unknown symbol {e} in a puzzle line")
+	if max(values) > size:
+		raise WrongDimentions(f"Value {SYMBOLS[max(values)-1]} does not fit a {size}x{size} puzzle")
+	return [values[i*size:(i+1)*size] for i in range(size)]
+
+# the whitespace separated tokens of the next line that is not blank
+def nextTokens(lines):
+	for line in lines:
+		tokens = line.split()
+		if len(tokens) > 0:
+			return tokens
+	raise WrongDimentions("Wrong dimentions. The file ends in the middle of a puzzle")
+
+# yields (board, p, q) for every puzzle in an iterable of lines, in either format:
+# a grid of whitespace separated numbers with one row per line, -1 for empty cells
+# as Loader reads them, optionally after a "p q" line giving the box shape, or one
+# puzzle per line as a string of SYMBOLS, the box shape is the most square one
+# for the size unless a header gives it
+def readPuzzleLines(lines):
+	lines = iter(lines)
+	for line in lines:
+		tokens = line.split()
+		if len(tokens) == 0:
+			continue
+		if len(tokens) == 1 and len(tokens[0]) > 2:
+			board = parseLine(tokens[0])
+			yield (board,) + geometry.boxShape(len(board))
+			continue
+		p = q = None
+		if len(tokens) == 2:
+			p, q = int(tokens[0]), int(tokens[1])
+			tokens = nextTokens(lines)
+		size = len(tokens)
+		if p is None:
+			p, q = geometry.boxShape(size)
+		elif p*q != size:
+			raise WrongDimentions(f"Wrong dimentions. Boxes of {p}x{q} do not fit rows of {size} numbers")
+		rows = [tokens]
+		while len(rows) < size:
+			rows.append(nextTokens(lines))
+			if len(rows[-1]) != size:
+				raise WrongDimentions(f"Wrong dimentions. Expected rows of {size} numbers, got {len(rows[-1])}")
+		yield [[int(t) + 1 for t in row] for row in rows], p, q
+
+# yields (board, p, q) for every puzzle of a file without reading the whole file first,
+# the file can also be a binary corpus written by corpus.CorpusWriter
+def readPuzzles(filename):
+	if corpus.isCorpus(filename):
+		with corpus.Corpus(filename) as puzzles:
+			yield from puzzles.puzzles()
+		return
+	with openText(filename) as f:
+		yield from readPuzzleLines(f)
+
+# yields (board, p, q) for every puzzle in several files, each of which can hold many puzzles
+def readPuzzleFiles(filenames):
+	for filename in filenames:
+		yield from readPuzzles(filename)
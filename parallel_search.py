@@ -0,0 +1,170 @@
+import sys
+import time
+import queue
+from multiprocessing import Process, Queue, Value, cpu_count
+import loader
+import sudoku_solver_nlxh
+
+"------------------------------------------------------------------------------"
+# Searches a single board on several processes
+#
+# The search tree is cut at the first guess points into subproblems, which are
+# boards with the guessed variables filled in. Workers take subproblems from a
+# shared queue and solve them with the normal backtracking search. When a worker
+# is waiting for work and the queue is empty, a busy worker hands over the
+# untried values of its oldest guess, the largest subtrees it has left, and
+# continues with the rest. The first solution found stops every worker.
+
+# a busy worker checks for idle workers every this many guesses
+CHECK_INTERVAL = 32
+
+# counters shared by the workers, each one is a multiprocessing Value
+class SharedCounters:
+    # workers waiting for a subproblem
+    idle = None
+    # subproblems on the queue that nobody took yet
+    queued = None
+    # subproblems not finished yet, the search is over when this reaches 0
+    pending = None
+    # subproblems handed over by busy workers
+    donated = None
+
+    def __init__(self):
+        self.idle = Value("i", 0)
+        self.queued = Value("i", 0)
+        self.pending = Value("i", 0)
+        self.donated = Value("i", 0)
+
+# backtracking solver that gives away part of its search tree when other workers are idle
+class SharingSolver(sudoku_solver_nlxh.sudokuSolver):
+    tasks = None
+    counters = None
+
+    def makeVarGuess(self):
+        if self.guesses % CHECK_INTERVAL == 0 and self.counters.idle.value > self.counters.queued.value:
+            self.shareWork()
+        super().makeVarGuess()
+
+    # put the untried values of the oldest open guess on the task queue
+    def shareWork(self):
+        boards = self.splitWork()
+        if len(boards) == 0:
+            return
+        # count the new subproblems before anyone can take them
+        with self.counters.pending.get_lock():
+            self.counters.pending.value += len(boards)
+        with self.counters.queued.get_lock():
+            self.counters.queued.value += len(boards)
+        with self.counters.donated.get_lock():
+            self.counters.donated.value += len(boards)
+        for board in boards:
+            self.tasks.put(board)
+
+# takes subproblems off the task queue until the process is terminated,
+# puts ("solution", values) or ("finished", None) on the results queue
+def runWorker(tasks, results, counters, comparator, size, p, q):
+    solver = None
+    while True:
+        with counters.idle.get_lock():
+            counters.idle.value += 1
+        board = tasks.get()
+        with counters.idle.get_lock():
+            counters.idle.value -= 1
+        with counters.queued.get_lock():
+            counters.queued.value -= 1
+
+        if solver is None:
+            solver = SharingSolver(board, size, comparator, p, q)
+            solver.tasks = tasks
+            solver.counters = counters
+        else:
+            solver.reset(board)
+        solver.setDomains()
+        if solver.solve() is not None:
+            results.put(("solution", solver.getValues()))
+        with counters.pending.get_lock():
+            counters.pending.value -= 1
+            if counters.pending.value == 0:
+                results.put(("finished", None))
+
+# cuts the search tree of board at its first guess points until there are at least count
+# subproblems, returns (subproblems, solution), solution is set if the split solved the board
+def splitBoard(board, count, comparator, p = None, q = None):
+    size = len(board)
+    solver = sudoku_solver_nlxh.sudokuSolver(board, size, comparator, p, q)
+    frontier = [board]
+    while len(frontier) > 0 and len(frontier) < count:
+        solver.reset(frontier.pop(0))
+        solver.setDomains()
+        solver.propagate()
+        if solver.solved:
+            return [], solver.getValues()
+        if solver.error:
+            continue
+        # branch on the variable with the smallest domain
+        var = solver.varQueue.top()
+        values = solver.getValues()
+        for val in sudoku_solver_nlxh.domainValues(var.domain):
+            child = [row[:] for row in values]
+            child[var.position[0]][var.position[1]] = val
+            frontier.append(child)
+    return frontier, None
+
+# searches board on a number of processes (one per core by default) and returns (solution, stats),
+# solution is None if the board has no solution, returns None on timeout
+def solveParallel(board, processes = None, timeout = None, splitFactor = 4,
+                  comparator = sudoku_solver_nlxh.leastConstrainingValue, p = None, q = None):
+    startTime = time.time()
+    if processes is None:
+        processes = cpu_count()
+    subproblems, solution = splitBoard(board, processes*splitFactor, comparator, p, q)
+    stats = {"subproblems": len(subproblems), "donated": 0}
+    if solution is not None or len(subproblems) == 0:
+        stats["time"] = time.time() - startTime
+        return solution, stats
+
+    tasks = Queue()
+    results = Queue()
+    counters = SharedCounters()
+    counters.pending.value = len(subproblems)
+    counters.queued.value = len(subproblems)
+    for subproblem in subproblems:
+        tasks.put(subproblem)
+    workers = [Process(target=runWorker, args=(tasks, results, counters, comparator, len(board), p, q), daemon=True)
+               for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    try:
+        # block until a solution arrives or every subproblem is finished
+        kind, solution = results.get(timeout=timeout)
+    except queue.Empty:
+        return None
+    finally:
+        for worker in workers:
+            worker.terminate()
+        for worker in workers:
+            worker.join()
+    stats["donated"] = counters.donated.value
+    stats["time"] = time.time() - startTime
+    return solution, stats
+
+"------------------------------------------------------------------------------"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: parallel_search.py SIZE FILE [PROCESSES]")
+        exit(1)
+    SIZE = int(sys.argv[1])
+    board = loader.Loader(SIZE, [])
+    board.loadFromFile(sys.argv[2])
+    processes = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    solution, stats = solveParallel(board.data, processes)
+    print("%d subproblems, %d handed over between workers, %.3f seconds" % (
+        stats["subproblems"], stats["donated"], stats["time"]))
+    if solution is None:
+        print("No solution!")
+        exit(1)
+    print("Solved!")
+    for row in solution:
+        print(" ".join(str(value - 1) for value in row))
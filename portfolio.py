@@ -0,0 +1,86 @@
+import sys
+import time
+import queue
+from multiprocessing import Process, Queue
+import loader
+import sudoku_solver_nlxh
+
+"------------------------------------------------------------------------------"
+# Races several solver configurations on the same board
+#
+# Each configuration is a dict of sudokuSolver settings and runs in its own
+# process. The first process to finish wins, since any complete search either
+# finds a solution or proves there is none, and the others are terminated.
+
+# the configurations raced by default
+DEFAULT_PORTFOLIO = [
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue},
+    {"comparator": sudoku_solver_nlxh.mostConstrainingValue},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue, "fishSize": 0},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue, "fishSize": 4},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue, "allDifferent": True},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue,
+     "variableOrder": sudoku_solver_nlxh.domainOverWeightedDegree},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue,
+     "variableOrder": sudoku_solver_nlxh.domainOverWeightedDegree, "seed": 3},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue, "seed": 1},
+    {"comparator": sudoku_solver_nlxh.mostConstrainingValue, "seed": 2},
+    {"comparator": sudoku_solver_nlxh.leastConstrainingValue,
+     "restartSchedule": sudoku_solver_nlxh.lubyRestarts},
+]
+
+# solves board with one configuration and puts (index, solution, stats) on the queue
+def runConfig(board, index, config, p, q, results):
+    startTime = time.time()
+    solver = sudoku_solver_nlxh.sudokuSolver(board, len(board), p=p, q=q, **config)
+    solver.setDomains()
+    solution = solver.solve()
+    stats = {"time": time.time() - startTime,
+             "guesses": solver.guesses,
+             "backtracks": solver.backtracks}
+    results.put((index, solver.getValues() if solution is not None else None, stats))
+
+# races the configurations on board and returns (index, solution, stats) of the first one
+# to finish, solution is None if the board has no solution, returns None on timeout
+def solvePortfolio(board, configs = DEFAULT_PORTFOLIO, timeout = None, p = None, q = None):
+    results = Queue()
+    processes = [Process(target=runConfig, args=(board, i, config, p, q, results), daemon=True)
+                 for i, config in enumerate(configs)]
+    for process in processes:
+        process.start()
+    try:
+        # block until the first result arrives
+        return results.get(timeout=timeout)
+    except queue.Empty:
+        return None
+    finally:
+        # cancel everyone that is still running
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join()
+
+"------------------------------------------------------------------------------"
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("Usage: portfolio.py SIZE FILE [TIMEOUT]")
+        exit(1)
+    SIZE = int(sys.argv[1])
+    board = loader.Loader(SIZE, [])
+    board.loadFromFile(sys.argv[2])
+    timeout = float(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    result = solvePortfolio(board.data, timeout=timeout)
+    if result is None:
+        print("Timed out!")
+        exit(1)
+    index, solution, stats = result
+    print("configuration %d finished in %.3f seconds: %s" % (index, stats["time"], DEFAULT_PORTFOLIO[index]))
+    if solution is None:
+        print("No solution!")
+        exit(1)
+    print("Solved!")
+    for row in solution:
+        print(" ".join(str(value - 1) for value in row))
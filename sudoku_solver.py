@@ -1,7 +1,7 @@
-import math
 import heapq
 import KB
 import loader
+import geometry
 
 # this constant says which number is consider to be no number set in this cell
 EMPTY = 0
@@ -47,11 +47,13 @@ class Variable:
 class sudokuSolver:
     
     # The board will be a 2 dimensional array
-    board = []
+    board = None
+    # precomputed rows, columns and boxes for this board size
+    geometry = None
     # the variable heap/queue will be a list of variable objects sorted as a heap
-    varHeap = []
+    varHeap = None
     # For each value 1-25, a set of variables that cannot be that value
-    constraintArr = []
+    constraintArr = None
     # the 1 dimensional size of the board
     size = 0
     # a set of all possible values a variable could have
@@ -59,10 +61,10 @@ class sudokuSolver:
     # when searchmode is true, every assignment gets recorded, so the solver can backtrack
     searchMode = False
     # list of variables for backtracking
-    backtrackList = []
-    restoreSet = [set()]
+    backtrackList = None
+    restoreSet = None
     # Knowledge Base
-    kb = KB.KB()
+    kb = None
     # boolean value identifying if the problem is solved yet
     solved = False
     # boolean value identifying if the problem has no solution
@@ -70,9 +72,16 @@ class sudokuSolver:
     
     def __init__(self, board, size = 25):
         self.size = size
+        self.geometry = geometry.geometryForSize(size)
         self.allValues = set(i for i in range(1,size+1))
         #self.allValues = set(i for i in range(0,size))
         print(self.allValues)
+        self.board = []
+        self.varHeap = []
+        self.constraintArr = []
+        self.backtrackList = []
+        self.restoreSet = [set()]
+        self.kb = KB.KB()
         # initialize constraintArr
         for i in range(size):
             self.constraintArr.append([set()])
@@ -102,12 +111,9 @@ class sudokuSolver:
     def boxConstraints(self, x, y) -> set:
         # iterate through all cells in the box for this Variable
         con = set()
-        cellSize = int(math.sqrt(self.size))
-        xStart = (x // cellSize)*cellSize
-        yStart = (y // cellSize)*cellSize
-        for row in range(yStart,yStart+cellSize):
-            for col in range(xStart,xStart+cellSize):
-                con.add(self.board[col][row].value)
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            con.add(self.board[col][row].value)
         return con
     
     # for a given empty position on the board, identify constraints
@@ -153,13 +159,10 @@ class sudokuSolver:
 
     # remove val from domains in a box
     def updateBoxConstraints(self, x, y, val):
-        cellSize = int(math.sqrt(self.size))
-        xStart = (x // cellSize)*cellSize
-        yStart = (y // cellSize)*cellSize
-        for row in range(yStart,yStart+cellSize):
-            for col in range(xStart,xStart+cellSize):
-                self.board[col][row].domain[-1].discard(val)
-                self.constraintArr[val-1][-1].add(self.board[col][row])
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            self.board[col][row].domain[-1].discard(val)
+            self.constraintArr[val-1][-1].add(self.board[col][row])
 
     # assigns the variable in x, y to the value val
     def assignVariable(self, var, val, guess = False):
@@ -252,38 +255,36 @@ class sudokuSolver:
 
     def searchBoxRestrictions(self, val) -> bool:
         assigned = False
-        cellSize = int(math.sqrt(self.size))
         # for every box on the board...
-        for cellX in range(cellSize):
-            for cellY in range(cellSize):
-                available = []
-                # add up all available variables for this value
-                for x in range(cellX*cellSize, cellX*cellSize+cellSize):
-                    for y in range(cellY*cellSize, cellY*cellSize+cellSize):
-                        if self.board[x][y].value == EMPTY and self.board[x][y] not in self.constraintArr[val-1][-1]:
-                                available.append((x,y))
-                # check if assignment can be made (only 1 available variable) 
-                if len(available) == 1:
-                    x,y = available[0]
-                    self.assignVariable(self.board[x][y], val)
-                    assigned = True
-                # THIS IMPROVES SPEED
-                elif len(available) > 1:
-                    # check if all in same row or col
-                    rowSame = True
-                    colSame = True
-                    row, col = available[0]
-                    for i in range(1, len(available)):
-                        if rowSame and row != available[i][0]:
-                            rowSame = False
-                        if colSame and col != available[i][1]:
-                            colSame = False
-                    if rowSame:
-                        # remove val from entire row
-                        self.updateColConstraints(row, val, set(available))
-                    if colSame:
-                        # remove val from entire col
-                        self.updateRowConstraints(col, val, set(available))
+        for box in self.geometry.boxes:
+            available = []
+            # add up all available variables for this value
+            for i in box:
+                x, y = self.geometry.positions[i]
+                if self.board[x][y].value == EMPTY and self.board[x][y] not in self.constraintArr[val-1][-1]:
+                        available.append((x,y))
+            # check if assignment can be made (only 1 available variable) 
+            if len(available) == 1:
+                x,y = available[0]
+                self.assignVariable(self.board[x][y], val)
+                assigned = True
+            # THIS IMPROVES SPEED
+            elif len(available) > 1:
+                # check if all in same row or col
+                rowSame = True
+                colSame = True
+                row, col = available[0]
+                for i in range(1, len(available)):
+                    if rowSame and row != available[i][0]:
+                        rowSame = False
+                    if colSame and col != available[i][1]:
+                        colSame = False
+                if rowSame:
+                    # remove val from entire row
+                    self.updateColConstraints(row, val, set(available))
+                if colSame:
+                    # remove val from entire col
+                    self.updateRowConstraints(col, val, set(available))
         return assigned
                     
     def searchRowRestrictions(self, val) -> bool:
@@ -325,26 +326,26 @@ class sudokuSolver:
         return assigned
     
     #-----------------------------------------------------------------------------
-    # THIS IS SLOW AND NOT USEFULL -----------------------------------------------
+    # knowledge base queries, KB answers them with its CDCL engine
     
     def tellKB(self, terms, val):
         pclause = set()
         for t in terms:
-            pclause.add( KB.Term("c%d%d=%d"%(t[0], t[1], val)) )
+            pclause.add( KB.Term("c%d_%d=%d"%(t[0], t[1], val)) )
         pClause = KB.Clause(pclause)
         self.kb.tell(pClause)
         
         for t1 in terms:
             for t2 in terms:
                 if t1 != t2:
-                    term1 = KB.Term("c%d%d=%d"%(t1[0], t1[1], val),True)
-                    term2 = KB.Term("c%d%d=%d"%(t2[0], t2[1], val),True)
+                    term1 = KB.Term("c%d_%d=%d"%(t1[0], t1[1], val),True)
+                    term2 = KB.Term("c%d_%d=%d"%(t2[0], t2[1], val),True)
                     nClause = KB.Clause([term1,term2])
                     self.kb.tell(nClause)
         print("KB size: ", len(self.kb.kb))
 
     def askKB(self, var, val):
-        name = "c%d%d=%d"%(var.position[0], var.position[1], val)
+        name = "c%d_%d=%d"%(var.position[0], var.position[1], val)
         return self.kb.ask(KB.Clause([KB.Term(name)]))
         
         
@@ -373,9 +374,9 @@ class sudokuSolver:
             for y in range(self.size):
                 val = self.board[x][y].value - 1 if (self.board[x][y].value != EMPTY) else "*"
                 print(val, end=" ")
-                if (y+1) % int(math.sqrt(self.size)) == 0:
+                if (y+1) % self.geometry.q == 0:
                     print("\t", end="")
-            if (x+1) % int(math.sqrt(self.size)) == 0:
+            if (x+1) % self.geometry.p == 0:
                 print()
         print()
 
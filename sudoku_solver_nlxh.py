@@ -1,8 +1,9 @@
-import math
-import heapq
-import time
+import random
+import itertools
+from collections import deque
 import loader
-from multiprocessing import Process, Queue
+import geometry
+from var_queue import VarQueue
 import verifier
 #import time
 
@@ -12,40 +13,128 @@ EMPTY = 0
 SOLUTION = "12 24 6 10 16 17 2 7 18 4 25 11 3 22 23 1 9 20 19 8 5 21 14 13 15 11 5 21 14 23 10 24 9 6 19 7 2 15 16 4 25 3 22 13 18 1 17 8 12 20 20 1 13 8 9 16 5 21 14 11 19 24 10 18 12 17 2 15 7 4 22 3 6 25 23 15 25 3 22 19 12 1 13 8 20 21 5 9 17 14 6 23 24 10 11 4 2 7 18 16 4 17 2 7 18 15 25 3 22 23 20 1 13 8 6 16 5 21 14 12 19 24 9 10 11 24 6 5 13 10 4 19 2 21 18 23 25 8 14 20 12 1 11 15 9 16 7 3 22 17 23 16 1 3 14 11 6 24 15 5 4 17 2 7 19 20 25 18 22 10 12 9 13 8 21 9 12 8 21 22 23 16 1 7 14 11 6 24 15 10 5 13 3 17 2 20 25 4 19 18 19 20 25 15 11 9 12 22 13 17 16 3 5 1 18 8 24 4 21 7 14 6 2 23 10 18 4 17 2 7 20 8 25 3 10 9 12 22 13 21 23 6 19 16 14 11 5 24 15 1 10 11 18 24 3 8 4 17 2 7 15 20 25 19 22 9 12 6 1 13 23 16 5 21 14 8 23 16 5 21 24 11 6 25 15 18 4 14 2 17 19 20 7 3 22 10 12 1 9 13 6 14 12 1 15 19 13 16 5 21 10 9 7 24 11 18 4 23 2 17 8 20 25 3 22 22 19 20 25 13 18 14 12 1 9 5 23 16 21 3 10 11 8 24 15 6 4 17 2 7 7 9 4 17 2 22 23 20 10 3 12 8 1 6 13 14 16 25 5 21 18 11 15 24 19 14 18 23 6 24 7 15 4 17 2 22 19 20 25 1 11 10 12 9 3 21 13 16 5 8 21 7 9 16 5 6 10 11 19 24 17 18 4 3 15 22 14 13 8 20 25 23 12 1 2 13 8 15 12 1 21 22 5 16 25 14 10 11 9 7 2 18 17 4 23 24 19 20 6 3 3 10 11 20 25 13 9 14 12 1 8 21 23 5 2 15 19 16 6 24 7 18 22 17 4 2 22 19 4 17 3 18 23 20 8 13 16 6 12 24 21 7 5 25 1 15 10 11 14 9 16 15 10 11 6 2 7 18 23 22 3 14 19 4 25 13 8 9 12 5 17 1 21 20 24 5 21 24 23 4 14 17 15 11 6 2 7 18 10 9 3 22 1 20 25 13 8 19 16 12 1 13 14 9 12 5 20 10 24 16 6 15 21 11 8 4 17 2 18 19 3 22 23 7 25 25 3 22 19 20 1 21 8 9 12 24 13 17 23 16 7 15 10 11 6 2 14 18 4 5 17 2 7 18 8 25 3 19 4 13 1 22 12 20 5 24 21 14 23 16 9 15 10 11 6".split(" ")
 BEST_SCORE = 0
 
+# backtracks allowed in the first run of a restart schedule
+RESTART_SCALE = 32
+# nogoods with more decisions than this are not recorded
+NOGOOD_SIZE = 8
+
+# kinds of changes recorded on the undo trail
+TRAIL_DOMAIN = 0
+TRAIL_VALUE = 1
+TRAIL_CONSTRAINT_DISCARD = 2
+TRAIL_CONSTRAINT_ADD = 3
+
+"------------------------------------------------------------------------------"
+# domains are stored as integer bitmasks, bit v is set while value v is still possible
+
+def valueBit(val):
+    return 1 << val
+
+# smallest value left in a domain
+def lowestValue(mask):
+    return (mask & -mask).bit_length() - 1
+
+# comparators for LCV, module level so they can be sent to other processes
+def leastConstrainingValue(count, bestCount):
+    return count < bestCount
+
+def mostConstrainingValue(count, bestCount):
+    return count > bestCount
+
+# variable orderings, each one returns the next variable to guess or None when all are assigned
+
+# the variable with the smallest domain (MRV)
+def minimumRemainingValues(solver):
+    return solver.varQueue.top(solver.rng)
+
+# the variable with the smallest domain size divided by the weight of its units (dom/wdeg),
+# units gain weight every time they wipe out a domain, so search goes to the conflicts first,
+# ties are broken at random when the solver has a seed
+def domainOverWeightedDegree(solver):
+    best = None
+    bestScore = 0
+    ties = 1
+    for bucket in solver.varQueue.buckets:
+        for var in bucket:
+            weight = 0
+            for unit in solver.geometry.unitsOf[var.index]:
+                weight += solver.unitWeights[unit]
+            score = var.domain.bit_count() / weight
+            if best is None or score < bestScore:
+                best = var
+                bestScore = score
+                ties = 1
+            elif solver.rng is not None and score == bestScore:
+                ties += 1
+                if solver.rng.randrange(ties) == 0:
+                    best = var
+    return best
+
+# iterate over the values in a domain from smallest to largest
+def domainValues(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+# restart schedules, each one returns the number of backtracks allowed in the given run
+
+# the i-th number of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ..., starting at i = 1
+def luby(i):
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if i == (1 << k) - 1:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+def lubyRestarts(run):
+    return RESTART_SCALE * luby(run + 1)
+
+def geometricRestarts(run):
+    return int(RESTART_SCALE * 1.5 ** run)
+
 "------------------------------------------------------------------------------"
 # each cell in the board should contain a Variable
 class Variable:
-    # Domain for the variable, current domain is the last or [-1] index
-    domain = [set()]
+    # Domain for the variable as a bitmask of possible values
+    domain = 0
     # The value of the variable EMPTY means no assignment
     value = EMPTY
     # The x and y axis location of this variable
     position = (0,0)
+    # flat index of this variable in the board geometry
+    index = 0
+    # bucket and position of this variable in the VarQueue, bucket is -1 when it is not queued
+    bucket = -1
+    bucketPos = 0
     
-    def __init__(self, value, x, y):
+    def __init__(self, value, x, y, index):
         self.value = value
         self.position = (x,y)
-        self.domain = [set()]
-        self.heuristic = [0 for i in range(25)]
+        self.index = index
+        self.domain = 0
+        self.bucket = -1
+        self.bucketPos = 0
 
     def __lt__(self, other):
-        return len(self.domain[-1]) < len(other.domain[-1])
+        return self.domain.bit_count() < other.domain.bit_count()
     def __le__(self, other):
-        return len(self.domain[-1]) <= len(other.domain[-1])
+        return self.domain.bit_count() <= other.domain.bit_count()
     def __eq__(self, other):
-        return len(self.domain[-1]) == len(other.domain[-1])
+        return self.domain.bit_count() == other.domain.bit_count()
     def __ne__(self, other):
-        return len(self.domain[-1]) != len(other.domain[-1])
+        return self.domain.bit_count() != other.domain.bit_count()
     def __gt__(self, other):
-        return len(self.domain[-1]) > len(other.domain[-1])
+        return self.domain.bit_count() > other.domain.bit_count()
     def __ge__(self, other):
-        return len(self.domain[-1]) >= len(other.domain[-1])
+        return self.domain.bit_count() >= other.domain.bit_count()
     def __hash__(self):
-        return self.position[0] + 25*self.position[1]
+        return self.index
     def __str__(self):
         string = "cell (%d %d)"%(self.position[0], self.position[1])
         string += "{"
-        for v in self.domain[-1]:
+        for v in domainValues(self.domain):
             string += str(v) + " "
         string += "}"
         return string
@@ -53,166 +142,277 @@ class Variable:
 "------------------------------------------------------------------------------"
 class sudokuSolver:
     
+    # all mutable state is created per instance in __init__ and reset, so several solvers
+    # can live in the same process and one solver can be reused for many boards
+
     # The board will be a 2 dimensional array
-    board = []
-    # the variable heap/queue will be a list of variable objects sorted as a heap
-    varHeap = []
-    # For each value 1-25, a set of variables that cannot be that value
-    constraintArr = []
+    board = None
+    # the same variables indexed by their flat geometry index
+    cells = None
+    # precomputed rows, columns, boxes and peers for this board size
+    geometry = None
+    # the unassigned variables, ordered by domain size
+    varQueue = None
+    # For each value 1-25, a set of variables that can still be that value, index 0 holds the assigned variables
+    constraintArr = None
+    # for each unit and value, the number of cells of the unit with the value in their domain
+    unitCounts = None
     # the 1 dimensional size of the board
     size = 0
-    # a set of all possible values a variable could have
-    allValues = set()
+    # a bitmask of all possible values a variable could have
+    allValues = 0
     # when searchmode is true, every assignment gets recorded, so the solver can backtrack
     searchMode = False
     # list of variables for backtracking
-    backtrackList = []
-    restoreSet = [set()]
+    backtrackList = None
+    # every change made since the first guess, undone in reverse order when backtracking
+    trail = None
+    # length of the trail at each guess
+    trailMarks = None
+    # units whose cells changed since they were last searched, and a flag for each unit on the queue
+    unitQueue = None
+    unitQueued = None
     # boolean value identifying if the problem is solved yet
     solved = False
     # boolean value identifying if the problem has no solution
     error = False
-    # size of a box cell
-    cellSize = 5
-    # how many of each value are present on board
-    heuristic = []
     # comparator for LCV
     comparator = None
+    # largest fish to look for: 2 for X-Wings, 3 for Swordfish, 4 for Jellyfish, 0 for none
+    fishSize = 2
+    # values removed by fish of each size for the current board
+    fishEliminations = None
+    # when True, every searched unit also gets the all-different matching filter
+    allDifferent = False
+    # last maximum matching found in each unit, as {cell index: value}, used as a starting point
+    unitMatching = None
+    # picks the variable to guess, minimumRemainingValues or domainOverWeightedDegree
+    variableOrder = None
+    # weight of each unit for dom/wdeg, starts at 1 and grows with every wipeout in the unit
+    unitWeights = None
+    # number of backtracks allowed per run, lubyRestarts or geometricRestarts, None never restarts
+    restartSchedule = None
+    # number of restarts for the current board, and the backtrack count of the next one
+    restarts = 0
+    restartLimit = 0
+    # refuted combinations of guesses, as tuples of (cell index, value), kept across restarts
+    nogoods = None
+    # when True, AC-3 runs on the peer constraints before the search and after every guess
+    ac3 = False
+    # values removed by AC-3, domains it emptied, and the values removed after each guess and each
+    # new value a backtrack gives the guessed variable
+    revisions = 0
+    wipeouts = 0
+    guessRevisions = None
+    # random number generator used to break ties between variables and values, None for no randomness
+    rng = None
+    # number of guesses and backtracks made for the current board
+    guesses = 0
+    backtracks = 0
     
-    def __init__(self, board, size, comparator):
+    def __init__(self, board, size, comparator, p = None, q = None, fishSize = 2, seed = None, allDifferent = False, ac3 = False,
+                 variableOrder = minimumRemainingValues, restartSchedule = None):
         self.size = size
         self.comparator = comparator
+        self.fishSize = fishSize
+        self.allDifferent = allDifferent
+        self.ac3 = ac3
+        self.variableOrder = variableOrder
+        self.restartSchedule = restartSchedule
+        if seed is not None:
+            self.rng = random.Random(seed)
+        elif restartSchedule is not None:
+            # restarts need random tie-breaking, or every run would search the same tree
+            self.rng = random.Random(0)
         self.searchDepth = 2
-        self.cellSize = int(math.sqrt(self.size))
-        self.allValues = set(i for i in range(1,size+1))
-        #self.allValues = set(i for i in range(0,size))
-        #print(self.allValues)
-        # initialize constraintArr
-        for i in range(size+1):
-            self.constraintArr.append([set()])
+        if p is None:
+            self.geometry = geometry.geometryForSize(size)
+        else:
+            self.geometry = geometry.getGeometry(p, q)
+        self.allValues = ((1 << size) - 1) << 1
+        self.varQueue = VarQueue(size)
         # initialize the board with Variable objects in each cell
+        self.board = []
+        self.cells = []
         for x in range(size):
             self.board.append([])
             for y in range(size):
-                self.board[-1].append(Variable(board[x][y],x,y))
-                if self.board[-1][-1].value == EMPTY:
-                    self.varHeap.append(self.board[-1][-1])
+                self.board[-1].append(Variable(EMPTY,x,y,self.geometry.index(x,y)))
+                self.cells.append(self.board[-1][-1])
+        self.reset(board)
+
+    # load a new board into the solver, reusing the Variable objects and geometry,
+    # call setDomains() and solve() afterwards as for a new solver
+    def reset(self, board):
+        self.trail = []
+        self.trailMarks = []
+        self.backtrackList = []
+        self.varQueue.clear()
+        self.unitQueue = deque()
+        self.unitQueued = [False for i in range(len(self.geometry.units))]
+        self.unitMatching = [{} for i in range(len(self.geometry.units))]
+        self.unitWeights = [1 for i in range(len(self.geometry.units))]
+        self.unitCounts = [[0 for val in range(self.size+1)] for i in range(len(self.geometry.units))]
+        # initialize constraintArr
+        self.constraintArr = [set() for i in range(self.size+1)]
+        self.searchMode = False
+        self.solved = False
+        self.error = False
+        self.guesses = 0
+        self.backtracks = 0
+        self.fishEliminations = [0 for i in range(self.fishSize+1)]
+        self.revisions = 0
+        self.wipeouts = 0
+        self.guessRevisions = []
+        self.restarts = 0
+        self.restartLimit = self.restartSchedule(0) if self.restartSchedule is not None else 0
+        self.nogoods = set()
+        for var in self.cells:
+            var.value = board[var.position[0]][var.position[1]]
+            var.domain = 0
+            var.bucket = -1
     
-    # returns constraints from this variables row
-    def rowConstraints(self, y) -> set:
-        con = set()
-        for x in range(len(self.board)):
-            con.add(self.board[x][y].value)
+    # returns the values of the cells in a unit as a bitmask
+    def unitConstraints(self, unit) -> int:
+        con = 0
+        for i in unit:
+            con |= valueBit(self.cells[i].value)
         return con
+
+    # returns constraints from this variables row as a bitmask of values
+    def rowConstraints(self, y) -> int:
+        return self.unitConstraints(self.geometry.cols[y])
      
-    # returns constraints from this variables column
-    def colConstraints(self, x) -> set:
-        con = set()
-        for y in range(len(self.board[0])):
-            con.add(self.board[x][y].value)
-        return con
+    # returns constraints from this variables column as a bitmask of values
+    def colConstraints(self, x) -> int:
+        return self.unitConstraints(self.geometry.rows[x])
 
-    # returns constraints from this variables box
-    def boxConstraints(self, x, y) -> set:
-        # iterate through all cells in the box for this Variable
-        con = set()
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                con.add(self.board[col][row].value)
-        return con
+    # returns constraints from this variables box as a bitmask of values
+    def boxConstraints(self, x, y) -> int:
+        return self.unitConstraints(self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]])
     
     # for a given empty position on the board, identify constraints
-    def findConstraints(self, x, y) -> set:
-        constraints = set()
-        # get row constraints
-        constraints.update(self.rowConstraints(y))
-        # get column constraints
-        constraints.update(self.colConstraints(x))
-        # get box constraints
-        constraints.update(self.boxConstraints(x,y))
-        return constraints
+    def findConstraints(self, x, y) -> int:
+        # the peers cover the row, column and box
+        return self.unitConstraints(self.geometry.peers[self.geometry.index(x,y)])
     
     # Initializes every variable on the board to its possible values based on constraints
     # This will minimize searching later
     def setDomains(self):
-        for x in range(self.size):
-            for y in range(self.size):
-                con = self.findConstraints(x,y)
-                # set the domain of variable
-                if(self.board[x][y].value == EMPTY):
-                    self.board[x][y].domain[-1] = self.allValues.difference(con)
-                else:
-                    self.constraintArr[0][-1].add(self.board[x][y])
+        for var in self.cells:
+            # set the domain of variable
+            if(var.value == EMPTY):
+                domain = self.allValues & ~self.unitConstraints(self.geometry.peers[var.index])
+                self.changeDomain(var, domain)
+                self.varQueue.push(var)
                 # add the variable to the constraint array
-                if(self.board[x][y].value == EMPTY):
-                    for c in self.allValues.difference(con):
-                        self.constraintArr[c][-1].add(self.board[x][y])
+                for c in domainValues(domain):
+                    self.constraintArr[c].add(var)
+            else:
+                self.constraintArr[0].add(var)
+        # every unit has to be searched once
+        for unit in range(len(self.geometry.units)):
+            self.unitQueued[unit] = True
+            self.unitQueue.append(unit)
                         
     #-----------------------------------------------------------------------------
     # Heuristic Least Constrained Value
 
+    # number of cells in a unit that can still be val, kept up to date by changeDomain
+    def countUnitConstraints(self, unitNumber, val):
+        return self.unitCounts[unitNumber][val]
+
     def countBoxConstraints(self, x, y, val):
-        count = 0
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                if val in self.board[col][row].domain[-1]:
-                    count += 1
-        return count
+        return self.countUnitConstraints(2*self.size + self.geometry.boxOf[self.geometry.index(x,y)], val)
     
     def countRowConstraints(self, y, val):
-        count = 0
-        for x in range(len(self.board)):
-            if val in self.board[x][y].domain[-1]:
-                count += 1
-        return count
+        return self.countUnitConstraints(self.size + y, val)
 
     def countColConstraints(self, x, val):
-        count = 0
-        for y in range(len(self.board[0])):
-            if val in self.board[x][y].domain[-1]:
-                count += 1
-        return count
+        return self.countUnitConstraints(x, val)
 
     def countConstraints(self, var, val):
-        x, y = var.position
-        #print("counting constrains for", x+1, y+1, val)
-        count = self.countBoxConstraints(x, y, val)
-        #print("box", self.countBoxConstraints(x, y, val))
-        count += self.countRowConstraints(y, val)
-        #print("row", self.countRowConstraints(y, val))
-        count += self.countColConstraints(x, val)
-        #print("col", self.countColConstraints(x, val))
+        #print("counting constrains for", var.position[0]+1, var.position[1]+1, val)
+        count = 0
+        for unit in self.geometry.unitsOf[var.index]:
+            count += self.unitCounts[unit][val]
         return count
+
+    # replace the domain of a variable, updating the counts of the values that
+    # were removed or added in the units of the variable
+    def changeDomain(self, var, domain):
+        units = self.geometry.unitsOf[var.index]
+        for val in domainValues(var.domain & ~domain):
+            for unit in units:
+                self.unitCounts[unit][val] -= 1
+        for val in domainValues(domain & ~var.domain):
+            for unit in units:
+                self.unitCounts[unit][val] += 1
+        var.domain = domain
     
     #-----------------------------------------------------------------------------
-    
+    # every change below goes through these so it can be undone when backtracking
+
+    # set the domain of a variable
+    def setDomain(self, var, domain):
+        if self.trailMarks:
+            self.trail.append((TRAIL_DOMAIN, var, var.domain))
+        if var.value == EMPTY and domain != var.domain:
+            self.queueUnits(var)
+        self.changeDomain(var, domain)
+        if var.bucket >= 0:
+            self.varQueue.update(var)
+
+    # set the value of a variable
+    def setValue(self, var, val):
+        if self.trailMarks:
+            self.trail.append((TRAIL_VALUE, var, var.value))
+        var.value = val
+        if var.bucket >= 0:
+            self.varQueue.remove(var)
+
+    # remove a variable from the constraint set of val
+    def discardConstraint(self, val, var):
+        if var in self.constraintArr[val]:
+            if self.trailMarks:
+                self.trail.append((TRAIL_CONSTRAINT_DISCARD, val, var))
+            self.constraintArr[val].discard(var)
+
+    # add a variable to the constraint set of val
+    def addConstraint(self, val, var):
+        if var not in self.constraintArr[val]:
+            if self.trailMarks:
+                self.trail.append((TRAIL_CONSTRAINT_ADD, val, var))
+            self.constraintArr[val].add(var)
+
+    # remove val from the domain of a single variable
+    def removeValue(self, var, val, bit):
+        if var.domain & bit:
+            self.setDomain(var, var.domain & ~bit)
+            if var.domain == 0 and var.value == EMPTY:
+                # wiped out, every unit of the cell takes part of the blame
+                for unit in self.geometry.unitsOf[var.index]:
+                    self.unitWeights[unit] += 1
+        self.discardConstraint(val, var)
+
+    # remove val from domains of every cell in a unit
+    def updateUnitConstraints(self, unit, val, skip=set()):
+        bit = valueBit(val)
+        for i in unit:
+            if self.cells[i] not in skip:
+                self.removeValue(self.cells[i], val, bit)
+
     # remove val from domains in a row
     def updateRowConstraints(self, y, val, skip=set()):
-        for x in range(len(self.board)):
-            if self.board[x][y] not in skip:
-                self.board[x][y].domain[-1].discard(val)
-                self.constraintArr[val][-1].discard(self.board[x][y])
+        self.updateUnitConstraints(self.geometry.cols[y], val, skip)
 
     # remove val from domains in a col
     def updateColConstraints(self, x, val, skip=set()):
-        for y in range(len(self.board[0])):
-            if self.board[x][y] not in skip:
-                self.board[x][y].domain[-1].discard(val)
-                self.constraintArr[val][-1].discard(self.board[x][y])
+        self.updateUnitConstraints(self.geometry.rows[x], val, skip)
 
     # remove val from domains in a box
     def updateBoxConstraints(self, x, y, val, skip=set()):
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                if self.board[col][row] not in skip:
-                    self.board[col][row].domain[-1].discard(val)
-                    self.constraintArr[val][-1].discard(self.board[col][row])
+        self.updateUnitConstraints(self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]], val, skip)
 
     # assigns the variable in x, y to the value val
     def assignVariable(self, var, val, guess = False):
@@ -220,31 +420,29 @@ class sudokuSolver:
         #    print("guess ", val, "to ", var.position[0], var.position[1])
         #else:
         #    print("assigning ", val, "to ", var.position[0], var.position[1])
-        var.value = val
-        var.domain[-1].discard(val)
+        # the guessed value is removed before the checkpoint, so backtracking tries the others
+        self.setDomain(var, var.domain & ~valueBit(val))
+        if guess:
+            self.guesses += 1
+            self.backtrackList.append(var)
+            self.checkpointBoard()
+        self.setValue(var, val)
         for i in range(1,self.size+1):
-            self.constraintArr[i][-1].discard(var)
-        self.constraintArr[0][-1].add(var)
+            self.discardConstraint(i, var)
+        self.addConstraint(0, var)
         
         if not verifier.okSoFar(self):
             print("assigning ", val, "to ", var.position[0], var.position[1])
             print("not ok")
             self.printConstraint(val)
-            print(var.domain[-1], "guessing: ", guess)
+            print(list(domainValues(var.domain)), "guessing: ", guess)
             raise Exception('invalid move')
             input()
         
-        if guess:
-            self.backtrackList.append(var)
-            self.checkpointBoard()
-            self.restoreSet[-1].add(var)
-            
-        elif self.searchMode:
-            self.restoreSet[-1].add(var)
         #update constraints for all affected variables
-        self.updateRowConstraints(var.position[1], val)
-        self.updateColConstraints(var.position[0], val)
-        self.updateBoxConstraints(var.position[0], var.position[1], val)
+        bit = valueBit(val)
+        for i in self.geometry.peers[var.index]:
+            self.removeValue(self.cells[i], val, bit)
         self.error = self.checkIfError()
 
         '''score = 0
@@ -266,322 +464,434 @@ class sudokuSolver:
 
     def backTrack(self):
         #print("made a mistake, backtracking...")
+        # the last guess failed with all the guesses before it, remember that for after a restart
+        if self.restartSchedule is not None and len(self.backtrackList) <= NOGOOD_SIZE:
+            self.nogoods.add(tuple((var.index, var.value) for var in self.backtrackList))
         variable = self.backtrackList.pop()
+        self.backtracks += 1
         #print("variable", variable)
-        variable.heuristic[variable.value-1] -= 1
         #print(variable)
-        #print(variable.heuristic)
         # restore board to last checkpoint
         self.restoreBoard()
         # reassign value
-        if len(variable.domain[-1]) > 0:
-            #val = variable.domain[-1].pop()
-            values = iter(variable.domain[-1])
-            bestVal = next(values)
-            bestCount = self.countConstraints(variable, bestVal)
-            for v in values:
-                count = self.countConstraints(variable, v)
-                if self.comparator(count, bestCount):
-                    bestVal = v
-                    bestCount = count
+        if variable.domain:
+            bestVal = self.chooseValue(variable)
             #print(variable, "->", bestVal)
-            variable.domain[-1].discard(bestVal)
-            if len(variable.domain[-1]) == 0:
+            self.setDomain(variable, variable.domain & ~valueBit(bestVal))
+            if variable.domain == 0:
                 self.assignVariable(variable, bestVal) # no longer a guess
             else:
                 #self.printBoard()
                 self.assignVariable(variable, bestVal, True) # still making a guess
+            self.reviseGuess(variable)
         else:
             self.error = True
         # if there are no more guesses in the backtrack list, turn searchMode off
         if len(self.backtrackList) == 0:
             self.searchMode = False
         #variable.value = EMPTY
-        # we don't know if this variable is in the queue or not, but it needs to be there
-        # a duplicate variable in the varHeap should not be an issue, it will eventually get discarded
-        self.varHeap.append(variable)
         #input()
 
 
-    # restore the board to the last checkpoint
+    # restore the board to the last checkpoint by undoing the trail back to its mark
     def restoreBoard(self):
-        for i in range(0,self.size+1):
-            self.constraintArr[i].pop()
-        for x in range(len(self.board)):
-            for y in range(len(self.board[0])):
-                self.board[x][y].domain.pop()
-        for v in self.restoreSet[-1]:
-            v.value = EMPTY;
-            self.varHeap.append(v)
-        self.restoreSet.pop()
+        self.clearUnitQueue()
+        mark = self.trailMarks.pop()
+        while len(self.trail) > mark:
+            entry = self.trail.pop()
+            if entry[0] == TRAIL_DOMAIN:
+                self.changeDomain(entry[1], entry[2])
+                if entry[1].bucket >= 0:
+                    self.varQueue.update(entry[1])
+            elif entry[0] == TRAIL_VALUE:
+                entry[1].value = entry[2]
+                self.varQueue.push(entry[1])
+            elif entry[0] == TRAIL_CONSTRAINT_DISCARD:
+                self.constraintArr[entry[1]].add(entry[2])
+            else:
+                self.constraintArr[entry[1]].discard(entry[2])
 
     # create a restore point for the board when a guess is made
     def checkpointBoard(self):
-        for i in range(0,self.size+1):
-            self.constraintArr[i].append(set([v for v in self.constraintArr[i][-1]]))
-        for x in range(len(self.board)):
-            for y in range(len(self.board[0])):
-                self.board[x][y].domain.append(set([v for v in self.board[x][y].domain[-1]]))
-        self.restoreSet.append(set())
+        self.trailMarks.append(len(self.trail))
 
     #-----------------------------------------------------------------------------
 
-    # searches the board for easy moves (where domain has 1 element)
-    def searchOneElementDomains(self):
-        assigned = False
-        keepGoing = True
-        i = 0
-        while keepGoing:
-            keepGoing = False
-            heapq.heapify(self.varHeap)
-            # if the heap has a variable that has already been assigned, remove it
-            while len(self.varHeap) > 0 and self.varHeap[0].value != EMPTY:
-                heapq.heappop(self.varHeap)
-            # checks if the top variable of the heap can be resolved...
-            while len(self.varHeap) > 0 and self.varHeap[0].value == EMPTY and len(self.varHeap[0].domain[-1]) == 1:
-                val = self.varHeap[0].domain[-1].pop()
-                var = heapq.heappop(self.varHeap)
-                self.assignVariable(var, val)
-                keepGoing = True
-                assigned = True
-            i += 1
-        return assigned
-            
-    #-----------------------------------------------------------------------------
+    # add the units of a variable to the propagation queue
+    def queueUnits(self, var):
+        for unit in self.geometry.unitsOf[var.index]:
+            if not self.unitQueued[unit]:
+                self.unitQueued[unit] = True
+                self.unitQueue.append(unit)
 
-    def searchBoxRestrictions(self, val) -> bool:
-        assigned = False
-        available = [set() for i in range(self.size)]
-        for var in self.constraintArr[val][-1]:
-            if var.value == EMPTY:
-                    cellX = var.position[0]//self.cellSize
-                    cellY = var.position[1]//self.cellSize
-                    key = cellX + cellY*self.cellSize
-                    available[key].add(var)
-        xWingBox = []
-        for box in available:
-            box1 = []
-            for var in box:
-                if val not in var.domain[-1]:
-                    self.constraintArr[val][-1].discard(var)
-                else:
-                    box1.append(var)
-            if len(box1) == 1:# and val in box[0].domain[-1]:
-                self.assignVariable(box1[0], val)
-                assigned = True
-            elif len(box1) == 2:
-                xWingBox.append(box1)
-            
-            # THIS IMPROVES SPEED
-            if len(box1) > 1:
-                # check if all in same row or col
-                rowSame = True
-                colSame = True
-                row, col = box1[0].position
-                for i in range(1, len(box1)):
-                    if rowSame and row != box1[i].position[0]:
-                        rowSame = False
-                    if colSame and col != box1[i].position[1]:
-                        colSame = False
-                if rowSame:
-                    # remove val from entire row
-                    self.updateColConstraints(row, val, set(box1))
-                if colSame:
-                    # remove val from entire col
-                    self.updateRowConstraints(col, val, set(box1))
-            
-        if len(xWingBox) == 2:
-            self.searchXWing(xWingBox[0], xWingBox[1], val, False, False, True)
-        return assigned
-  
-                    
-    def searchRowRestrictions(self, val) -> bool:
-        assigned = False
-        available = [[] for i in range(self.size)]
-        for var in self.constraintArr[val][-1]:
-            if var.value == EMPTY:
-                available[var.position[0]].append(var)
-        xWingRows = []
-        for row in available:
-            row1 = []
-            for var in row:
-                if val not in var.domain[-1]:
-                    self.constraintArr[val][-1].discard(var)
-                else:
-                    row1.append(var)
-            if len(row1) == 1:# and val in row[0].domain[-1]:
-                self.assignVariable(row1[0], val)
-                assigned = True
-            elif len(row1) == 2:
-                xWingRows.append(row1)
-            
-            # THIS IMPROVES SPEED
-            if len(row1) > 1:
-                # check if all in same box
-                cell = row1[0].position[0]//self.cellSize + self.cellSize*(row1[0].position[1]//self.cellSize)
-                boxSame = True
-                for i in range(1, len(row1)):
-                    if boxSame and cell != row1[i].position[0]//self.cellSize + self.cellSize*(row1[i].position[1]//self.cellSize):
-                        boxSame = False
-                if boxSame:
-                    # remove val from entire box
-                    self.updateBoxConstraints(row1[0].position[0], row1[0].position[1], val, set(row1))
-            
-        if len(xWingRows) == 2:
-            self.searchXWing(xWingRows[0], xWingRows[1], val, True, False, False)
-        return assigned
-
-
-    def searchColRestrictions(self, val) -> bool:
-        assigned = False
-        available = [[] for i in range(self.size)]
-        for var in self.constraintArr[val][-1]:
-            if var.value == EMPTY:
-                available[var.position[0]].append(var)
-        xWingCols = []
-        for col in available:
-            col1 = []
-            for var in col:
-                if val not in var.domain[-1]:
-                    self.constraintArr[val][-1].discard(var)
-                else:
-                    col1.append(var)
-            if len(col1) == 1:# and val in col[0].domain[-1]:
-                self.assignVariable(col1[0], val)
-                assigned = True
-            elif len(col1) == 2:
-                xWingCols.append(col1)
-            
-            # THIS IMPROVES SPEED
-            if len(col1) > 1:
-                # check if all in same box
-                cell = col1[0].position[0]//self.cellSize + self.cellSize*(col1[0].position[1]//self.cellSize)
-                boxSame = True
-                for i in range(1, len(col1)):
-                    if boxSame and cell != col1[i].position[0]//self.cellSize + self.cellSize*(col1[i].position[1]//self.cellSize):
-                        boxSame = False
-                if boxSame:
-                    # remove val from entire box
-                    self.updateBoxConstraints(col1[0].position[0], col1[0].position[1], val, set(col1))
-            
-        if len(xWingCols) == 2:
-            self.searchXWing(xWingCols[0], xWingCols[1], val, False, True, False)
-        return assigned
-
-                    
-    def searchAllRestrictions(self) -> bool:
-        assigned = False
-        for i in range(self.size):
-            a = self.searchBoxRestrictions(i+1)
-            if self.error:
-                return True
-            b = self.searchRowRestrictions(i+1)
-            if self.error:
-                return True
-            c = self.searchColRestrictions(i+1)
+    # empty the propagation queue, the board at a checkpoint has nothing left to propagate
+    def clearUnitQueue(self):
+        for unit in self.unitQueue:
+            self.unitQueued[unit] = False
+        self.unitQueue.clear()
+
+    # looks for hidden singles and pointing candidates in one unit,
+    # makes at most one assignment, which queues the unit again
+    def searchUnit(self, unitNumber):
+        unit = self.geometry.units[unitNumber]
+        cells = self.cells
+        # values placed in the unit, and values that one or more than one cell can be
+        placed = 0
+        once = 0
+        twice = 0
+        for i in unit:
+            var = cells[i]
+            if var.value != EMPTY:
+                placed |= valueBit(var.value)
+            else:
+                twice |= once & var.domain
+                once |= var.domain
+        # a value with nowhere to go
+        if self.allValues & ~(placed | once):
+            self.unitWeights[unitNumber] += 1
+            self.error = True
+            return
+        # a value with only one cell left is a hidden single
+        singles = once & ~twice & ~placed
+        if singles:
+            val = lowestValue(singles)
+            for i in unit:
+                if cells[i].value == EMPTY and cells[i].domain & singles & -singles:
+                    self.assignVariable(cells[i], val)
+                    return
+        if self.allDifferent:
+            self.searchAllDifferent(unitNumber, [cells[i] for i in unit if cells[i].value == EMPTY],
+                                    self.allValues & ~placed)
             if self.error:
-                return True
-            if a or b or c:
-                assigned = True
-        return assigned
+                return
+        # if every candidate of a value is in the same box (or the same line for a box),
+        # the value can be removed from the rest of that box (or line)
+        g = self.geometry
+        isBox = unitNumber >= 2*self.size
+        for val in domainValues(twice & ~placed):
+            bit = valueBit(val)
+            candidates = [cells[i] for i in unit if cells[i].value == EMPTY and cells[i].domain & bit]
+            if isBox:
+                row = g.rowOf[candidates[0].index]
+                col = g.colOf[candidates[0].index]
+                if all(g.rowOf[var.index] == row for var in candidates):
+                    self.updateUnitConstraints(g.rows[row], val, set(candidates))
+                if all(g.colOf[var.index] == col for var in candidates):
+                    self.updateUnitConstraints(g.cols[col], val, set(candidates))
+            else:
+                box = g.boxOf[candidates[0].index]
+                if all(g.boxOf[var.index] == box for var in candidates):
+                    self.updateUnitConstraints(g.boxes[box], val, set(candidates))
+
+    # Regin's all-different filter for one unit: a value is removed from a cell when no way
+    # of giving every empty cell of the unit a different free value uses it, sets error when
+    # there is no such way at all
+    def searchAllDifferent(self, unitNumber, variables, free):
+        values = list(domainValues(free))
+        count = len(variables)
+        if len(values) != count:
+            self.unitWeights[unitNumber] += 1
+            self.error = True
+            return
+        valueIndex = {val: j for j, val in enumerate(values)}
+        # candidate value numbers of each cell
+        adjacent = [[valueIndex[val] for val in domainValues(var.domain & free)] for var in variables]
+        # maximum matching, starting from whatever is still valid of the last one found
+        matchOf = [-1 for i in range(count)]
+        varOf = [-1 for j in range(count)]
+        previous = self.unitMatching[unitNumber]
+        for i, var in enumerate(variables):
+            val = previous.get(var.index, EMPTY)
+            if val in valueIndex and var.domain & valueBit(val) and varOf[valueIndex[val]] == -1:
+                matchOf[i] = valueIndex[val]
+                varOf[valueIndex[val]] = i
+
+        def augment(i, seen):
+            for j in adjacent[i]:
+                if not seen[j]:
+                    seen[j] = True
+                    if varOf[j] == -1 or augment(varOf[j], seen):
+                        matchOf[i] = j
+                        varOf[j] = i
+                        return True
+            return False
+
+        for i in range(count):
+            if matchOf[i] == -1 and not augment(i, [False for j in range(count)]):
+                self.unitWeights[unitNumber] += 1
+                self.error = True
+                return
+        self.unitMatching[unitNumber] = {variables[i].index: values[matchOf[i]] for i in range(count)}
+
+        # strongly connected components (Tarjan) of the graph with an edge from each cell to
+        # its unmatched values and from each value to its matched cell, cells are nodes
+        # 0..count-1 and values count..2*count-1
+        def successors(node):
+            if node < count:
+                return [count + j for j in adjacent[node] if j != matchOf[node]]
+            return [varOf[node - count]]
+
+        order = [-1 for node in range(2*count)]
+        low = [0 for node in range(2*count)]
+        component = [-1 for node in range(2*count)]
+        stack = []
+        counter = [0, 0]
+
+        def connect(node):
+            order[node] = low[node] = counter[0]
+            counter[0] += 1
+            stack.append(node)
+            for succ in successors(node):
+                if order[succ] == -1:
+                    connect(succ)
+                    low[node] = min(low[node], low[succ])
+                elif component[succ] == -1:
+                    low[node] = min(low[node], order[succ])
+            if low[node] == order[node]:
+                while True:
+                    member = stack.pop()
+                    component[member] = counter[1]
+                    if member == node:
+                        break
+                counter[1] += 1
+
+        for node in range(2*count):
+            if order[node] == -1:
+                connect(node)
+
+        # with a perfect matching, an unmatched edge is only usable inside a cycle
+        for i, var in enumerate(variables):
+            for j in adjacent[i]:
+                if j != matchOf[i] and component[i] != component[count + j]:
+                    self.removeValue(var, values[j], valueBit(values[j]))
+
+    # basic fish of val with the lines of lineOf as base and the lines of crossOf as cover:
+    # when the candidates of n base lines lie in only n cover lines, val can be removed from
+    # the rest of those cover lines, returns the number of values removed
+    def searchLineFish(self, val, candidates, lineOf, crossOf, crossLines):
+        removed = 0
+        bit = valueBit(val)
+        # the cover lines of each base line as a bitmask
+        lines = [0 for i in range(self.size)]
+        for var in candidates:
+            if var.domain & bit:
+                lines[lineOf[var.index]] |= 1 << crossOf[var.index]
+        for n in range(2, self.fishSize+1):
+            # lines with one candidate are hidden singles, which the unit search handles
+            base = [i for i in range(self.size) if 1 < lines[i].bit_count() <= n]
+            for fish in itertools.combinations(base, n):
+                cover = 0
+                for i in fish:
+                    cover |= lines[i]
+                if cover.bit_count() != n:
+                    continue
+                for c in domainValues(cover):
+                    for i in crossLines[c]:
+                        var = self.cells[i]
+                        if lineOf[i] not in fish and var.value == EMPTY and var.domain & bit:
+                            self.removeValue(var, val, bit)
+                            lines[lineOf[i]] &= ~(1 << c)
+                            self.fishEliminations[n] += 1
+                            removed += 1
+        return removed
+
+    # looks for X-Wings, Swordfish and Jellyfish up to fishSize of every value, with rows
+    # and with columns as base, and for X-Wings of two boxes,
+    # returns True if any value was removed
+    def searchFish(self) -> bool:
+        g = self.geometry
+        removed = 0
+        for val in range(1, self.size+1):
+            bit = valueBit(val)
+            candidates = [var for var in self.constraintArr[val] if var.value == EMPTY and var.domain & bit]
+            removed += self.searchLineFish(val, candidates, g.rowOf, g.colOf, g.cols)
+            removed += self.searchLineFish(val, candidates, g.colOf, g.rowOf, g.rows)
+            # two boxes with two candidates each in the same two rows or columns
+            groups = [[] for i in range(self.size)]
+            for var in candidates:
+                if var.domain & bit:
+                    groups[g.boxOf[var.index]].append(var)
+            pairs = [group for group in groups if len(group) == 2]
+            if len(pairs) == 2:
+                self.searchXWing(pairs[0], pairs[1], val, False, False, True)
+        return removed > 0 or len(self.unitQueue) > 0
+
+    # drains the propagation queue, assigning naked singles first and then searching the
+    # units whose cells changed, until nothing is left or an error is found
+    def propagateUnits(self):
+        while not self.error:
+            var = self.varQueue.top()
+            if var is not None and var.domain.bit_count() <= 1:
+                if var.domain == 0:
+                    self.error = True
+                    return
+                self.assignVariable(var, lowestValue(var.domain))
+            elif len(self.unitQueue) > 0:
+                unit = self.unitQueue.popleft()
+                self.unitQueued[unit] = False
+                self.searchUnit(unit)
+            else:
+                return
     
     #-----------------------------------------------------------------------------
+    # group1 and group2 are two units (isRow: two columns of the geometry, isCol: two rows,
+    # isBox: two boxes) in which val has exactly two candidates each
     def searchXWing(self, group1, group2, val, isRow, isCol, isBox):
-        # check for xwing pattern, are rows of points same
+        g = self.geometry
+        # check for xwing pattern, the points share two columns
         if not isRow:
-            if group1[0].position[1] == group2[0].position[1]:
-                if group1[1].position[1] == group2[1].position[1]:
-                    #print("found xwing in isRow", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateRowConstraints(group1[0].position[1], val, set([group1[0], group2[0]]))
-                    self.updateRowConstraints(group1[1].position[1], val, set([group1[1], group2[1]]))
-                    #self.printConstraint(val)
-                    #input()
-            elif group1[0].position[1] == group2[1].position[1]:
-                if group1[1].position[1] == group2[0].position[1]:
-                    #print("found xwing in isRow", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateRowConstraints(group1[0].position[1], val, set([group1[0], group2[1]]))
-                    self.updateRowConstraints(group1[1].position[1], val, set([group1[1], group2[0]]))
-                    #self.printConstraint(val)
-                    #input()
+            self.searchXWingUnits(group1, group2, val, g.colOf, g.cols)
+        # the points share two rows
         if not isCol:
-            if group1[0].position[0] == group2[0].position[0]:
-                if group1[1].position[0] == group2[1].position[0]:
-                    #print("found xwing in isCol", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateColConstraints(group1[0].position[0], val, set([group1[0], group2[0]]))
-                    self.updateColConstraints(group1[1].position[0], val, set([group1[1], group2[1]]))
-                    #self.printConstraint(val)
-                    #input()
-            elif group1[0].position[0] == group2[1].position[0]:
-                if group1[1].position[0] == group2[0].position[0]:
-                    #print("found xwing in isCol", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateColConstraints(group1[0].position[0], val, set([group1[0], group2[1]]))
-                    self.updateColConstraints(group1[1].position[0], val, set([group1[1], group2[0]]))
-                    #self.printConstraint(val)
-                    #input()
+            self.searchXWingUnits(group1, group2, val, g.rowOf, g.rows)
+        # the points share two boxes
         if not isBox:
-            # calculate box id's for each variable
-            g1box1 = group1[0].position[0]//self.cellSize + self.cellSize*(group1[0].position[1]//self.cellSize)
-            g1box2 = group1[1].position[0]//self.cellSize + self.cellSize*(group1[1].position[1]//self.cellSize)
-            g2box1 = group2[0].position[0]//self.cellSize + self.cellSize*(group2[0].position[1]//self.cellSize)
-            g2box2 = group2[1].position[0]//self.cellSize + self.cellSize*(group2[1].position[1]//self.cellSize)
-            if g1box1 == g2box1:
-                if g1box2 == g2box2:
-                    #print("found xwing in isBox", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateBoxConstraints(group1[0].position[0], group1[0].position[1], val, set([group1[0], group2[0]]))
-                    self.updateBoxConstraints(group1[1].position[0], group1[1].position[1], val, set([group1[1], group2[1]]))
-                    #self.printConstraint(val)
-                    #input()
-            if g1box1 == g2box2:
-                if g1box2 == g2box1:
-                    #print("found xwing in isBox", isRow, isCol, isBox)
-                    #self.printConstraint(val)
-                    self.updateBoxConstraints(group1[0].position[0], group1[0].position[1], val, set([group1[0], group2[1]]))
-                    self.updateBoxConstraints(group1[1].position[0], group1[1].position[1], val, set([group1[1], group2[0]]))
-                    #self.printConstraint(val)
-                    #input()
+            self.searchXWingUnits(group1, group2, val, g.boxOf, g.boxes)
+
+    # if the two points of both groups lie in the same two units, val can be removed from
+    # the rest of those units
+    def searchXWingUnits(self, group1, group2, val, unitOf, units):
+        g1unit1 = unitOf[group1[0].index]
+        g1unit2 = unitOf[group1[1].index]
+        g2unit1 = unitOf[group2[0].index]
+        g2unit2 = unitOf[group2[1].index]
+        if g1unit1 == g2unit1 and g1unit2 == g2unit2:
+            #print("found xwing", val)
+            self.updateUnitConstraints(units[g1unit1], val, set([group1[0], group2[0]]))
+            self.updateUnitConstraints(units[g1unit2], val, set([group1[1], group2[1]]))
+        elif g1unit1 == g2unit2 and g1unit2 == g2unit1:
+            #print("found xwing", val)
+            self.updateUnitConstraints(units[g1unit1], val, set([group1[0], group2[1]]))
+            self.updateUnitConstraints(units[g1unit2], val, set([group1[1], group2[0]]))
     
     #-----------------------------------------------------------------------------
 
-    # Make guesses when no other decisions can be made
-    def makeVarGuess(self):
-        heapq.heapify(self.varHeap)
-        # make sure top value of heap is not already assigned
-        if len(self.varHeap) == 0:
-            return
-        while self.varHeap[0].value != EMPTY:
-            heapq.heappop(self.varHeap)
-            heapq.heapify(self.varHeap)
-        if len(self.varHeap[0].domain[-1]) == 0:
-            error = True
-            return
-        # assign variable with smallest domain to a value, and record it in a stack
-        #bestVal = self.varHeap[0].domain[-1].pop()
-        
-        values = iter(self.varHeap[0].domain[-1])
+    # picks the value to try next for var using the LCV comparator,
+    # ties are broken at random when the solver has a seed
+    def chooseValue(self, var):
+        values = domainValues(var.domain)
         bestVal = next(values)
-        bestCount = self.countConstraints(self.varHeap[0], bestVal)
+        bestCount = self.countConstraints(var, bestVal)
+        ties = 1
         for v in values:
-            count = self.countConstraints(self.varHeap[0], v)
+            count = self.countConstraints(var, v)
             if self.comparator(count, bestCount):
                 bestVal = v
                 bestCount = count
-        #print(self.varHeap[0], "->", bestVal)
-        self.varHeap[0].domain[-1].discard(bestVal)
+                ties = 1
+            elif self.rng is not None and count == bestCount:
+                ties += 1
+                if self.rng.randrange(ties) == 0:
+                    bestVal = v
+        return bestVal
+
+    # Make guesses when no other decisions can be made
+    def makeVarGuess(self):
+        var = self.variableOrder(self)
+        if var is None:
+            return
+        if var.domain == 0:
+            self.error = True
+            return
+        # assign the chosen variable to a value, and record it in a stack
+        bestVal = self.chooseValue(var)
+        #print(var, "->", bestVal)
+        self.setDomain(var, var.domain & ~valueBit(bestVal))
         
-        var = heapq.heappop(self.varHeap)
-        if len(var.domain[-1]) > 0:
+        if var.domain:
             #print("var", var)
-            #print("var.domain", var.domain[-1])
+            #print("var.domain", var.domain)
             #self.printBoard()
             self.assignVariable(var, bestVal, True)
         else:
             self.assignVariable(var, bestVal, False) # sometimes, not actually a guess
-    
+        self.reviseGuess(var)
+
+    #-----------------------------------------------------------------------------
+    # AC-3 on the not-equal constraints between peers
+
+    # the arcs (i, j) from every peer i of var to var
+    def arcsInto(self, var):
+        return [(i, var.index) for i in self.geometry.peers[var.index]]
+
+    # runs AC-3 from a variable that was just guessed, or given its next value after a
+    # backtrack, starting with the arcs into it and into the peers it left with one value
+    def reviseGuess(self, var):
+        if not self.ac3 or self.error:
+            return
+        arcs = self.arcsInto(var)
+        for i in self.geometry.peers[var.index]:
+            if self.cells[i].value == EMPTY and self.cells[i].domain.bit_count() == 1:
+                arcs += self.arcsInto(self.cells[i])
+        self.guessRevisions.append(self.arcConsistency(arcs))
+
+    # revises the arcs of a worklist until it is empty: cell i loses a value when its peer j can
+    # only be that value, and i then gets its own incoming arcs checked, returns the number of
+    # revisions, sets error when a domain is wiped out
+    def arcConsistency(self, arcs):
+        cells = self.cells
+        peers = self.geometry.peers
+        worklist = deque(arcs)
+        queued = set(arcs)
+        revisions = 0
+        while len(worklist) > 0:
+            arc = worklist.popleft()
+            queued.discard(arc)
+            i, j = arc
+            var = cells[i]
+            other = cells[j]
+            if var.value != EMPTY:
+                continue
+            bit = valueBit(other.value) if other.value != EMPTY else other.domain
+            if bit.bit_count() != 1 or not var.domain & bit:
+                continue
+            self.removeValue(var, lowestValue(bit), bit)
+            revisions += 1
+            if var.domain == 0:
+                self.wipeouts += 1
+                self.error = True
+                break
+            # an arc into i can only revise anything once i has a single value left
+            if var.domain.bit_count() == 1:
+                for k in peers[i]:
+                    if k != j and (k, i) not in queued:
+                        queued.add((k, i))
+                        worklist.append((k, i))
+        self.revisions += revisions
+        return revisions
+
+    # hands out the untried values of the oldest guess that still has some, as a list of
+    # boards with the guessed variable set to each of those values, and removes them from
+    # this search, returns an empty list when every guess is on its last value
+    def splitWork(self):
+        for i, var in enumerate(self.backtrackList):
+            mark = self.trailMarks[i]
+            # the domain of var at the guess is the oldest one recorded after the mark
+            domain = var.domain
+            for entry in reversed(self.trail[mark:]):
+                if entry[0] == TRAIL_DOMAIN and entry[1] is var:
+                    domain = entry[2]
+            if domain == 0:
+                continue
+            # undo the assignments made since the guess to get the board at the guess
+            values = self.getValues()
+            for entry in reversed(self.trail[mark:]):
+                if entry[0] == TRAIL_VALUE:
+                    values[entry[1].position[0]][entry[1].position[1]] = entry[2]
+            boards = []
+            for val in domainValues(domain):
+                board = [row[:] for row in values]
+                board[var.position[0]][var.position[1]] = val
+                boards.append(board)
+            # drop the handed out values from every domain of var the trail can restore
+            for j in range(mark, len(self.trail)):
+                entry = self.trail[j]
+                if entry[0] == TRAIL_DOMAIN and entry[1] is var:
+                    self.trail[j] = (TRAIL_DOMAIN, var, entry[2] & ~domain)
+            self.changeDomain(var, var.domain & ~domain)
+            return boards
+        return []
+
     #-----------------------------------------------------------------------------
 
     def printBoard(self):
@@ -591,11 +901,15 @@ class sudokuSolver:
             for y in range(self.size):
                 val = self.board[x][y].value - 1 if (self.board[x][y].value != EMPTY) else "*"
                 print(val, end=" ")
-                if (y+1) % int(math.sqrt(self.size)) == 0:
+                if (y+1) % self.geometry.q == 0:
                     print("\t", end="")
-            if (x+1) % int(math.sqrt(self.size)) == 0:
+            if (x+1) % self.geometry.p == 0:
                 print()
 
+    # returns the values on the board as a 2 dimensional list, EMPTY where nothing is assigned
+    def getValues(self):
+        return [[var.value for var in row] for row in self.board]
+
     def returnBoard(self):
          for x in range(self.size):
             for y in range(self.size):
@@ -605,7 +919,7 @@ class sudokuSolver:
         for x in range(self.size):
             print()
             for y in range(self.size):
-                if self.board[x][y] in self.constraintArr[val][-1] and self.board[x][y] not in self.constraintArr[0][-1]:
+                if self.board[x][y] in self.constraintArr[val] and self.board[x][y] not in self.constraintArr[0]:
                     print("0", end=" ")
                 else:
                     print("*", end=" ")
@@ -619,109 +933,102 @@ class sudokuSolver:
         return True
 
     def checkIfError(self) -> bool:
-        heapq.heapify(self.varHeap)
-        while len(self.varHeap) > 0 and self.varHeap[0].value != EMPTY:
-            heapq.heappop(self.varHeap)
-        if len(self.varHeap) == 0:
-            return False
-        #print("heap top: ", self.varHeap[0])
-        #if len(self.varHeap[0].domain[-1]) == 0:
-            #print("ERROR: ", self.varHeap[0])
-        return len(self.varHeap[0].domain[-1]) == 0
+        return self.varQueue.hasEmptyDomain()
         
 
+    # makes every assignment that follows from the board without guessing,
+    # sets solved or error when the board is finished or has no solution
+    def propagate(self):
+        while not self.error:
+            self.propagateUnits()
+            if self.error:
+                break
+            # fish and nogoods need the whole board, so they are only searched once the queue is empty
+            if self.fishSize >= 2 and self.searchFish():
+                continue
+            if len(self.nogoods) == 0 or not self.searchNogoods():
+                break
+        self.solved = not self.error and len(self.varQueue) == 0
+
+    # a nogood whose assignments all hold is an error, and when all but one hold, the
+    # last one cannot hold either, returns True if any value was removed
+    def searchNogoods(self) -> bool:
+        removed = False
+        for nogood in self.nogoods:
+            last = None
+            for i, val in nogood:
+                var = self.cells[i]
+                if var.value == val:
+                    continue
+                if var.value != EMPTY or not var.domain & valueBit(val) or last is not None:
+                    # this nogood cannot be violated, or has more than one open assignment
+                    break
+                last = (var, val)
+            else:
+                if last is None:
+                    self.error = True
+                    return removed
+                self.removeValue(last[0], last[1], valueBit(last[1]))
+                removed = True
+        return removed
+
+    # undo every guess and start the search again from the board before the first one,
+    # keeping the nogoods and the dom/wdeg weights
+    def restart(self):
+        if len(self.backtrackList) == 0:
+            return
+        first = self.backtrackList[0]
+        val = first.value
+        while len(self.trailMarks) > 0:
+            self.restoreBoard()
+        # the first guess removed its value before there was a checkpoint to undo that
+        self.setDomain(first, first.domain | valueBit(val))
+        self.backtrackList = []
+        self.searchMode = False
+        self.error = False
+        self.restarts += 1
+        self.restartLimit = self.backtracks + self.restartSchedule(self.restarts)
+
     # algorithm for solving entire problem
-    # right now it only searches for domains with 1 element
-    # we will keep making this better...
+    # propagates after every guess and backtracks when propagation finds an error
     def solve(self):
-        while not self.solved and not self.error:
-            #print("-------------------- iteration ", i, " --------------------")
-            #print("SEARCH ONE ELEMENT DOMAINS")
-            self.searchOneElementDomains()
-            #print("SEARCH RESTRICTIONS")
-            assigned = self.searchAllRestrictions()
-            # if nothing can be assigned, then backtrack search
-            if not assigned:
-                self.searchMode = True
-            if self.searchMode and not assigned:
-                #print("MAKE VARIABLE GUESS")
-                self.makeVarGuess()
-            
-            # if backtrack mode is on, see if solution is consistent
-            self.error = self.checkIfError()
-            if self.searchMode:
-                while self.error and len(self.backtrackList) > 0:
-                    self.backTrack()
-                    self.error = self.checkIfError()
+        if self.ac3:
+            # only arcs into cells with a single value can revise anything
+            arcs = []
+            for var in self.cells:
+                if var.value != EMPTY or var.domain.bit_count() == 1:
+                    arcs += self.arcsInto(var)
+            self.arcConsistency(arcs)
+        self.propagate()
+        while not self.solved:
+            if self.error:
                 if len(self.backtrackList) == 0:
-                    self.searchMode = False
-
-            #if not verifier.okSoFar(self):
-            #    print("not ok")
-                
-            self.solved = self.checkIfSolved()
-            '''
-            print("----------------------")
-            for i,var in enumerate(self.backtrackList):
-                off = len(self.backtrackList) - i
-                string = "cell (%d %d)"%(var.position[0], var.position[1])
-                string += "{"
-                for v in var.domain[-1-off]:
-                    string += str(v) + " "
-                string += "}"
-                print(string)
-            self.printBoard()
-            input()
-            '''
-            
-        if self.solved:
-            return self.board
-            #correct = verifier.verify(self)
-            #if not correct:
-            #    raise Exception('wrong')
-        #if self.error:
-        #    print("No solution!!")
-
-        return None
+                    return None
+                self.backTrack()
+                self.error = self.checkIfError()
+                if self.restartSchedule is not None and self.backtracks >= self.restartLimit:
+                    self.restart()
+            else:
+                self.makeVarGuess()
+            if not self.error:
+                self.propagate()
+        return self.board
     
 "------------------------------------------------------------------------------"
 
-def solve(size, lcv, queue):
-    l = loader.Loader(size)
-    solver = sudokuSolver(l, size, lcv)
-    solver.setDomains()
-    solution = solver.solve()
-    queue.put(solution)
-
 if __name__ == "__main__":
+    import portfolio
     # print loaded board
     SIZE = 25
-    q = Queue()
-    p1 = Process(target=solve, args=(SIZE, lambda x, y: x < y, q,))
-    p1.start()
-    p2 = Process(target=solve, args=(SIZE, lambda x, y: x > y, q,))
-    p2.start()
-    #loader.Loader(SIZE)
     solver = sudokuSolver(loader.Loader(SIZE), SIZE, None)
     solver.printBoard()
 
-    #solve(SIZE, lambda x, y: x < y, q)
-
-    # join both threads until one of them found a solution
-    solution = None
-    for i in range(2):
-        while solution is None:
-            if not q.empty():
-                solution = q.get()
-
-            time.sleep(0.1)
-
-    p1.terminate()
-    p2.terminate()
+    # race the solver configurations until one of them is done
+    index, solution, stats = portfolio.solvePortfolio(solver.getValues())
 
     if solution is not None:
         print("Solved!")
-        solver.board = solution
+        solver.reset(solution)
         solver.printBoard()
         exit(0)
     else:
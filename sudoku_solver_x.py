@@ -1,6 +1,7 @@
-import math
 import heapq
+import itertools
 import loader
+import geometry
 import verifier
 #import time
 
@@ -48,11 +49,13 @@ class Variable:
 class sudokuSolver:
     
     # The board will be a 2 dimensional array
-    board = []
+    board = None
+    # precomputed rows, columns and boxes for this board size
+    geometry = None
     # the variable heap/queue will be a list of variable objects sorted as a heap
-    varHeap = []
+    varHeap = None
     # For each value 1-25, a set of variables that cannot be that value
-    constraintArr = []
+    constraintArr = None
     # the 1 dimensional size of the board
     size = 0
     # a set of all possible values a variable could have
@@ -60,22 +63,34 @@ class sudokuSolver:
     # when searchmode is true, every assignment gets recorded, so the solver can backtrack
     searchMode = False
     # list of variables for backtracking
-    backtrackList = []
-    restoreSet = [set()]
+    backtrackList = None
+    restoreSet = None
     # boolean value identifying if the problem is solved yet
     solved = False
     # boolean value identifying if the problem has no solution
     error = False
-    # size of a box cell
-    cellSize = 5
+    # largest naked/hidden subset to look for: 1 for singles only, 2 for pairs, 3 for triples, 4 for quads
+    inferenceLevel = 1
+    # largest fish to look for: 2 for X-Wings, 3 for Swordfish, 4 for Jellyfish, 0 for none
+    fishSize = 2
+    # values removed by fish of each size
+    fishEliminations = None
     
-    def __init__(self, board, size = 25):
+    def __init__(self, board, size = 25, inferenceLevel = 1, fishSize = 2):
         self.size = size
+        self.inferenceLevel = inferenceLevel
+        self.fishSize = fishSize
+        self.fishEliminations = [0 for i in range(fishSize+1)]
         self.searchDepth = 2
-        self.cellSize = int(math.sqrt(self.size))
+        self.geometry = geometry.geometryForSize(size)
         self.allValues = set(i for i in range(1,size+1))
         #self.allValues = set(i for i in range(0,size))
         #print(self.allValues)
+        self.board = []
+        self.varHeap = []
+        self.constraintArr = []
+        self.backtrackList = []
+        self.restoreSet = [set()]
         # initialize constraintArr
         for i in range(size+1):
             self.constraintArr.append([set()])
@@ -105,11 +120,9 @@ class sudokuSolver:
     def boxConstraints(self, x, y) -> set:
         # iterate through all cells in the box for this Variable
         con = set()
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                con.add(self.board[col][row].value)
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            con.add(self.board[col][row].value)
         return con
     
     # for a given empty position on the board, identify constraints
@@ -157,13 +170,11 @@ class sudokuSolver:
 
     # remove val from domains in a box
     def updateBoxConstraints(self, x, y, val, skip=set()):
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                if self.board[col][row] not in skip:
-                    self.board[col][row].domain[-1].discard(val)
-                    self.constraintArr[val][-1].discard(self.board[col][row])
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            if self.board[col][row] not in skip:
+                self.board[col][row].domain[-1].discard(val)
+                self.constraintArr[val][-1].discard(self.board[col][row])
 
     # assigns the variable in x, y to the value val
     def assignVariable(self, var, val, guess = False):
@@ -272,9 +283,7 @@ class sudokuSolver:
             if val not in var.domain[-1]:
                 remove.append(var)
             elif var.value == EMPTY:
-                    cellX = var.position[0]//self.cellSize
-                    cellY = var.position[1]//self.cellSize
-                    key = cellX + cellY*self.cellSize
+                    key = self.geometry.boxOf[self.geometry.index(*var.position)]
                     available[key].append(var)
         for v in remove:
             self.constraintArr[val][-1].discard(v)
@@ -320,28 +329,23 @@ class sudokuSolver:
                 available[var.position[0]].append(var)
         for v in remove:
             self.constraintArr[val][-1].discard(v)
-        xWingRows = []
         for row in available:
             if len(row) == 1 and val in row[0].domain[-1]:
                 self.assignVariable(row[0], val)
                 assigned = True
-            elif len(row) == 2:
-                xWingRows.append(row)
             
             # THIS IMPROVES SPEED
             if len(row) > 1:
                 # check if all in same box
-                cell = row[0].position[0]//self.cellSize + self.cellSize*(row[0].position[1]//self.cellSize)
+                cell = self.geometry.boxOf[self.geometry.index(*row[0].position)]
                 boxSame = True
                 for i in range(1, len(row)):
-                    if boxSame and cell != row[i].position[0]//self.cellSize + self.cellSize*(row[i].position[1]//self.cellSize):
+                    if boxSame and cell != self.geometry.boxOf[self.geometry.index(*row[i].position)]:
                         boxSame = False
                 if boxSame:
                     # remove val from entire box
                     self.updateBoxConstraints(row[0].position[0], row[0].position[1], val, set(row))
             
-        if len(xWingRows) == 2:
-            self.searchXWing(xWingRows[0], xWingRows[1], val, True, False, False)
         return assigned
 
 
@@ -356,28 +360,23 @@ class sudokuSolver:
                 available[var.position[0]].append(var)
         for v in remove:
             self.constraintArr[val][-1].discard(v)
-        xWingCols = []
         for col in available:
             if len(col) == 1 and val in col[0].domain[-1]:
                 self.assignVariable(col[0], val)
                 assigned = True
-            elif len(col) == 2:
-                xWingCols.append(col)
             
             # THIS IMPROVES SPEED
             if len(col) > 1:
                 # check if all in same box
-                cell = col[0].position[0]//self.cellSize + self.cellSize*(col[0].position[1]//self.cellSize)
+                cell = self.geometry.boxOf[self.geometry.index(*col[0].position)]
                 boxSame = True
                 for i in range(1, len(col)):
-                    if boxSame and cell != col[i].position[0]//self.cellSize + self.cellSize*(col[i].position[1]//self.cellSize):
+                    if boxSame and cell != self.geometry.boxOf[self.geometry.index(*col[i].position)]:
                         boxSame = False
                 if boxSame:
                     # remove val from entire box
                     self.updateBoxConstraints(col[0].position[0], col[0].position[1], val, set(col))
             
-        if len(xWingCols) == 2:
-            self.searchXWing(xWingCols[0], xWingCols[1], val, False, True, False)
         return assigned
 
                     
@@ -397,6 +396,120 @@ class sudokuSolver:
                 assigned = True
         return assigned
     
+    #-----------------------------------------------------------------------------
+    # Naked and hidden subsets
+
+    # remove val from the domain of a single variable
+    def discardValue(self, var, val):
+        var.domain[-1].discard(val)
+        self.constraintArr[val][-1].discard(var)
+
+    # the unassigned variables of every row, column and box
+    def unitVariables(self):
+        for unit in self.geometry.units:
+            variables = []
+            for i in unit:
+                x, y = self.geometry.positions[i]
+                if self.board[x][y].value == EMPTY:
+                    variables.append(self.board[x][y])
+            yield variables
+
+    # k cells of a unit whose domains hold only the same k values: no other cell
+    # of the unit can take those values, returns True if any value was removed
+    def searchNakedSubsets(self, variables, k) -> bool:
+        removed = False
+        small = [var for var in variables if 1 < len(var.domain[-1]) <= k]
+        for subset in itertools.combinations(small, k):
+            values = set().union(*(var.domain[-1] for var in subset))
+            if len(values) != k:
+                continue
+            for var in variables:
+                # Variable.__eq__ compares domain sizes, so the test has to be by identity
+                if all(var is not member for member in subset):
+                    for val in values.intersection(var.domain[-1]):
+                        self.discardValue(var, val)
+                        removed = True
+        return removed
+
+    # k values that only k cells of a unit can take: those cells cannot take
+    # any other value, returns True if any value was removed
+    def searchHiddenSubsets(self, variables, k) -> bool:
+        removed = False
+        unit = set(variables)
+        # the cells of the unit that can still be each value, from the per value index
+        places = {}
+        for val in self.allValues:
+            cells = set(var for var in unit.intersection(self.constraintArr[val][-1]) if val in var.domain[-1])
+            if 1 < len(cells) <= k:
+                places[val] = cells
+        for values in itertools.combinations(places, k):
+            cells = set().union(*(places[val] for val in values))
+            if len(cells) != k:
+                continue
+            for var in cells:
+                for val in var.domain[-1].difference(values):
+                    self.discardValue(var, val)
+                    removed = True
+        return removed
+
+    # looks for naked and hidden subsets up to the inference level in every unit,
+    # returns True if any value was removed
+    def searchSubsets(self) -> bool:
+        removed = False
+        for variables in self.unitVariables():
+            for k in range(2, self.inferenceLevel+1):
+                if len(variables) <= k:
+                    break
+                if self.searchNakedSubsets(variables, k):
+                    removed = True
+                if self.searchHiddenSubsets(variables, k):
+                    removed = True
+        return removed
+
+    #-----------------------------------------------------------------------------
+    # Basic fish: X-Wing, Swordfish and Jellyfish
+
+    # fish of val with the lines of the given axis of position as base and the other axis as
+    # cover: when the candidates of n base lines lie in only n cover lines, val can be removed
+    # from the rest of those cover lines, returns True if any value was removed
+    def searchLineFish(self, val, axis) -> bool:
+        removed = False
+        # the cover lines of the candidates of each base line
+        lines = [set() for i in range(self.size)]
+        for var in self.constraintArr[val][-1]:
+            if var.value == EMPTY and val in var.domain[-1]:
+                lines[var.position[axis]].add(var.position[1-axis])
+        for n in range(2, self.fishSize+1):
+            # lines with one candidate are hidden singles, which the restriction search handles
+            base = [i for i in range(self.size) if 1 < len(lines[i]) <= n]
+            for fish in itertools.combinations(base, n):
+                cover = set().union(*(lines[i] for i in fish))
+                if len(cover) != n:
+                    continue
+                for c in cover:
+                    for i in range(self.size):
+                        position = [0, 0]
+                        position[axis] = i
+                        position[1-axis] = c
+                        var = self.board[position[0]][position[1]]
+                        if i not in fish and var.value == EMPTY and val in var.domain[-1]:
+                            self.discardValue(var, val)
+                            lines[i].discard(c)
+                            self.fishEliminations[n] += 1
+                            removed = True
+        return removed
+
+    # looks for fish up to fishSize of every value, with the lines of both axes as base,
+    # returns True if any value was removed
+    def searchFish(self) -> bool:
+        removed = False
+        for val in self.allValues:
+            if self.searchLineFish(val, 0):
+                removed = True
+            if self.searchLineFish(val, 1):
+                removed = True
+        return removed
+
     #-----------------------------------------------------------------------------
     def searchXWing(self, group1, group2, val, isRow, isCol, isBox):
         # check for xwing pattern, are rows of points same
@@ -436,10 +549,10 @@ class sudokuSolver:
                     #input()
         if not isBox:
             # calculate box id's for each variable
-            g1box1 = group1[0].position[0]//self.cellSize + self.cellSize*(group1[0].position[1]//self.cellSize)
-            g1box2 = group1[1].position[0]//self.cellSize + self.cellSize*(group1[1].position[1]//self.cellSize)
-            g2box1 = group2[0].position[0]//self.cellSize + self.cellSize*(group2[0].position[1]//self.cellSize)
-            g2box2 = group2[1].position[0]//self.cellSize + self.cellSize*(group2[1].position[1]//self.cellSize)
+            g1box1 = self.geometry.boxOf[self.geometry.index(*group1[0].position)]
+            g1box2 = self.geometry.boxOf[self.geometry.index(*group1[1].position)]
+            g2box1 = self.geometry.boxOf[self.geometry.index(*group2[0].position)]
+            g2box2 = self.geometry.boxOf[self.geometry.index(*group2[1].position)]
             if g1box1 == g2box1:
                 if g1box2 == g2box2:
                     #print("found xwing in isBox", isRow, isCol, isBox)
@@ -489,9 +602,9 @@ class sudokuSolver:
             for y in range(self.size):
                 val = self.board[x][y].value if (self.board[x][y].value != EMPTY) else "*"
                 print(val, end=" ")
-                if (y+1) % int(math.sqrt(self.size)) == 0:
+                if (y+1) % self.geometry.q == 0:
                     print("\t", end="")
-            if (x+1) % int(math.sqrt(self.size)) == 0:
+            if (x+1) % self.geometry.p == 0:
                 print()
         #print()
 
@@ -534,6 +647,11 @@ class sudokuSolver:
             self.searchOneElementDomains()
             #print("SEARCH RESTRICTIONS")
             assigned = self.searchAllRestrictions()
+            # fish and subsets only remove values, try them before guessing
+            if not assigned and not self.error and self.fishSize > 1:
+                assigned = self.searchFish()
+            if not assigned and not self.error and self.inferenceLevel > 1:
+                assigned = self.searchSubsets()
             # if nothing can be assigned, then backtrack search
             if not assigned:
                 self.searchMode = True
@@ -586,6 +704,8 @@ if __name__ == "__main__":
     solver.setDomains()
     solver.solve()
     solver.printBoard()
+    if solver.fishSize > 1:
+        print("fish eliminations by size:", solver.fishEliminations[2:])
     '''
     solver.printConstraint(4)
     solver.searchRowRestrictions(4)
@@ -1,6 +1,6 @@
-import math
 import heapq
 import loader
+import geometry
 import verifier
 #import time
 
@@ -48,11 +48,13 @@ class Variable:
 class sudokuSolver:
     
     # The board will be a 2 dimensional array
-    board = []
+    board = None
+    # precomputed rows, columns and boxes for this board size
+    geometry = None
     # the variable heap/queue will be a list of variable objects sorted as a heap
-    varHeap = []
+    varHeap = None
     # For each value 1-25, a set of variables that cannot be that value
-    constraintArr = []
+    constraintArr = None
     # the 1 dimensional size of the board
     size = 0
     # a set of all possible values a variable could have
@@ -60,24 +62,27 @@ class sudokuSolver:
     # when searchmode is true, every assignment gets recorded, so the solver can backtrack
     searchMode = False
     # list of variables for backtracking
-    backtrackList = []
-    restoreSet = [set()]
+    backtrackList = None
+    restoreSet = None
     # boolean value identifying if the problem is solved yet
     solved = False
     # boolean value identifying if the problem has no solution
     error = False
-    # size of a box cell
-    cellSize = 5
     # iterative deepening depth
     searchDepth = 1
     deepeningStep = 5
     
     def __init__(self, board, size = 25):
         self.size = size
-        self.cellSize = int(math.sqrt(self.size))
+        self.geometry = geometry.geometryForSize(size)
         self.allValues = set(i for i in range(1,size+1))
         #self.allValues = set(i for i in range(0,size))
         #print(self.allValues)
+        self.board = []
+        self.varHeap = []
+        self.constraintArr = []
+        self.backtrackList = []
+        self.restoreSet = [set()]
         # initialize constraintArr
         for i in range(size+1):
             self.constraintArr.append([set()])
@@ -113,11 +118,9 @@ class sudokuSolver:
     def boxConstraints(self, x, y) -> set:
         # iterate through all cells in the box for this Variable
         con = set()
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                con.add(self.board[col][row].value)
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            con.add(self.board[col][row].value)
         return con
     
     # for a given empty position on the board, identify constraints
@@ -165,13 +168,11 @@ class sudokuSolver:
 
     # remove val from domains in a box
     def updateBoxConstraints(self, x, y, val, skip=set()):
-        xStart = (x // self.cellSize)*self.cellSize
-        yStart = (y // self.cellSize)*self.cellSize
-        for row in range(yStart,yStart+self.cellSize):
-            for col in range(xStart,xStart+self.cellSize):
-                if self.board[col][row] not in skip:
-                    self.board[col][row].domain[-1].discard(val)
-                    self.constraintArr[val][-1].discard(self.board[col][row])
+        for i in self.geometry.boxes[self.geometry.boxOf[self.geometry.index(x,y)]]:
+            col, row = self.geometry.positions[i]
+            if self.board[col][row] not in skip:
+                self.board[col][row].domain[-1].discard(val)
+                self.constraintArr[val][-1].discard(self.board[col][row])
 
     # assigns the variable in x, y to the value val
     def assignVariable(self, var, val, guess = False):
@@ -286,9 +287,7 @@ class sudokuSolver:
             if val not in var.domain[-1]:
                 remove.append(var)
             elif var.value == EMPTY:
-                    cellX = var.position[0]//self.cellSize
-                    cellY = var.position[1]//self.cellSize
-                    key = cellX + cellY*self.cellSize
+                    key = self.geometry.boxOf[self.geometry.index(*var.position)]
                     available[key].append(var)
         for v in remove:
             self.constraintArr[val][-1].discard(v)
@@ -345,10 +344,10 @@ class sudokuSolver:
             # THIS IMPROVES SPEED
             if len(row) > 1:
                 # check if all in same box
-                cell = row[0].position[0]//self.cellSize + self.cellSize*(row[0].position[1]//self.cellSize)
+                cell = self.geometry.boxOf[self.geometry.index(*row[0].position)]
                 boxSame = True
                 for i in range(1, len(row)):
-                    if boxSame and cell != row[i].position[0]//self.cellSize + self.cellSize*(row[i].position[1]//self.cellSize):
+                    if boxSame and cell != self.geometry.boxOf[self.geometry.index(*row[i].position)]:
                         boxSame = False
                 if boxSame:
                     # remove val from entire box
@@ -381,10 +380,10 @@ class sudokuSolver:
             # THIS IMPROVES SPEED
             if len(col) > 1:
                 # check if all in same box
-                cell = col[0].position[0]//self.cellSize + self.cellSize*(col[0].position[1]//self.cellSize)
+                cell = self.geometry.boxOf[self.geometry.index(*col[0].position)]
                 boxSame = True
                 for i in range(1, len(col)):
-                    if boxSame and cell != col[i].position[0]//self.cellSize + self.cellSize*(col[i].position[1]//self.cellSize):
+                    if boxSame and cell != self.geometry.boxOf[self.geometry.index(*col[i].position)]:
                         boxSame = False
                 if boxSame:
                     # remove val from entire box
@@ -450,10 +449,10 @@ class sudokuSolver:
                     #input()
         if not isBox:
             # calculate box id's for each variable
-            g1box1 = group1[0].position[0]//self.cellSize + self.cellSize*(group1[0].position[1]//self.cellSize)
-            g1box2 = group1[1].position[0]//self.cellSize + self.cellSize*(group1[1].position[1]//self.cellSize)
-            g2box1 = group2[0].position[0]//self.cellSize + self.cellSize*(group2[0].position[1]//self.cellSize)
-            g2box2 = group2[1].position[0]//self.cellSize + self.cellSize*(group2[1].position[1]//self.cellSize)
+            g1box1 = self.geometry.boxOf[self.geometry.index(*group1[0].position)]
+            g1box2 = self.geometry.boxOf[self.geometry.index(*group1[1].position)]
+            g2box1 = self.geometry.boxOf[self.geometry.index(*group2[0].position)]
+            g2box2 = self.geometry.boxOf[self.geometry.index(*group2[1].position)]
             if g1box1 == g2box1:
                 if g1box2 == g2box2:
                     #print("found xwing in isBox", isRow, isCol, isBox)
@@ -505,9 +504,9 @@ class sudokuSolver:
             for y in range(self.size):
                 val = self.board[x][y].value if (self.board[x][y].value != EMPTY) else "*"
                 print(val, end=" ")
-                if (y+1) % int(math.sqrt(self.size)) == 0:
+                if (y+1) % self.geometry.q == 0:
                     print("\t", end="")
-            if (x+1) % int(math.sqrt(self.size)) == 0:
+            if (x+1) % self.geometry.p == 0:
                 print()
         #print()
 
@@ -0,0 +1,77 @@
+"------------------------------------------------------------------------------"
+# Priority queue of unassigned variables keyed by domain size (MRV)
+#
+# Domain sizes are bounded by the board size, so variables are kept in one
+# bucket per size. Every variable is in at most one bucket, and remembers which
+# bucket and which position it is in, so it can be moved in O(1) when its
+# domain shrinks or grows again after backtracking.
+class VarQueue:
+    # buckets[i] holds the variables with i values left in their domain
+    buckets = None
+    # number of variables in the queue
+    count = 0
+    # no bucket below this index holds a variable
+    lowest = 0
+
+    def __init__(self, size):
+        self.buckets = [[] for i in range(size+1)]
+        self.count = 0
+        self.lowest = 0
+
+    # empty the queue, keeping the bucket lists
+    def clear(self):
+        for bucket in self.buckets:
+            for var in bucket:
+                var.bucket = -1
+            bucket.clear()
+        self.count = 0
+        self.lowest = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, var):
+        return var.bucket >= 0
+
+    # add a variable that is not in the queue yet
+    def push(self, var):
+        key = var.domain.bit_count()
+        bucket = self.buckets[key]
+        var.bucket = key
+        var.bucketPos = len(bucket)
+        bucket.append(var)
+        self.count += 1
+        if key < self.lowest:
+            self.lowest = key
+
+    # take a variable out of the queue
+    def remove(self, var):
+        bucket = self.buckets[var.bucket]
+        last = bucket.pop()
+        if last is not var:
+            bucket[var.bucketPos] = last
+            last.bucketPos = var.bucketPos
+        var.bucket = -1
+        self.count -= 1
+
+    # move a queued variable to the bucket matching its current domain size
+    def update(self, var):
+        if var.bucket != var.domain.bit_count():
+            self.remove(var)
+            self.push(var)
+
+    # the variable with the smallest domain, or None if the queue is empty,
+    # ties are broken at random when a random number generator is given
+    def top(self, rng = None):
+        while self.lowest < len(self.buckets) and len(self.buckets[self.lowest]) == 0:
+            self.lowest += 1
+        if self.lowest == len(self.buckets):
+            self.lowest = 0
+            return None
+        if rng is not None:
+            return rng.choice(self.buckets[self.lowest])
+        return self.buckets[self.lowest][-1]
+
+    # true if some queued variable has no values left
+    def hasEmptyDomain(self) -> bool:
+        return len(self.buckets[0]) > 0
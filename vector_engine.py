@@ -0,0 +1,214 @@
+import functools
+import geometry
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"------------------------------------------------------------------------------"
+# Propagation on NumPy candidate arrays
+#
+# The candidates of a board are an N x N x N boolean array, cand[x, y, v-1] is
+# True while cell (x, y) can still be v. Eliminations, naked singles, hidden
+# singles and box-line reductions are whole array reductions over rows (axis -2),
+# columns (axis -3) and boxes, so the loops over cells and values run inside
+# NumPy. Every function also works on a stack of boards, with any number of
+# leading axes.
+
+# cand viewed with the boxes split out, (..., N/p, p, N/q, q, N)
+def boxView(cand, g):
+    return cand.reshape(cand.shape[:-3] + (g.size // g.p, g.p, g.size // g.q, g.q, g.size))
+
+# for every cell and value, the number of candidates of that value in the box of the cell
+def boxCounts(cand, g):
+    boxes = boxView(cand, g)
+    counts = boxes.sum((-4, -2), keepdims=True)
+    return numpy.broadcast_to(counts, boxes.shape).reshape(cand.shape)
+
+# candidate array of a board given as a 2 dimensional list of values, EMPTY (0) for empty cells
+def candidates(board, g):
+    values = numpy.array(board, dtype=numpy.int32)
+    cand = numpy.ones((g.size, g.size, g.size), dtype=bool)
+    xs, ys = numpy.nonzero(values)
+    cand[xs, ys, :] = False
+    cand[xs, ys, values[xs, ys] - 1] = True
+    return cand
+
+# the values of the cells with one candidate left, EMPTY everywhere else
+def values(cand):
+    single = cand.sum(-1) == 1
+    return numpy.where(single, cand.argmax(-1) + 1, 0)
+
+# removes candidates by box-line reduction, in place: when every candidate of a value
+# in a box is on one line, the value is removed from the rest of that line, and when
+# every candidate of a value on a line is in one box, it is removed from the rest of that box
+def boxLineReduction(cand, g):
+    boxes = boxView(cand, g)
+    # the lines of each box that hold a value, (..., N/p, p, N/q, 1, N) for the rows
+    # and (..., N/p, 1, N/q, q, N) for the columns
+    for lineAxis, crossAxis, boxAxis in ((-4, -2, -3), (-2, -4, -5)):
+        inBox = boxes.any(crossAxis, keepdims=True)
+        # pointing: the value is on one line of the box, remove it from that line in the other boxes
+        pointing = inBox & (inBox.sum(lineAxis, keepdims=True) == 1)
+        boxes &= ~(pointing.sum(boxAxis, keepdims=True) - pointing > 0)
+        # claiming: the value is in one box of the line, remove it from the other lines of that box
+        inBox = boxes.any(crossAxis, keepdims=True)
+        claiming = inBox & (inBox.sum(boxAxis, keepdims=True) == 1)
+        boxes &= ~(claiming.sum(lineAxis, keepdims=True) - claiming > 0)
+
+# removes every candidate that the naked and hidden singles and box-line reduction rule out, in place,
+# until nothing changes, returns a boolean (one per board) that is True when a board has no solution
+def propagate(cand, g):
+    error = numpy.zeros(cand.shape[:-3], dtype=bool)
+    left = cand.sum()
+    while True:
+        # naked singles: the value of a cell with one candidate is removed from its peers
+        fixed = cand & (cand.sum(-1) == 1)[..., None]
+        rowFixed = fixed.sum(-2, keepdims=True)
+        colFixed = fixed.sum(-3, keepdims=True)
+        boxFixed = boxCounts(fixed, g)
+        error |= ((rowFixed > 1).any((-3, -2, -1)) | (colFixed > 1).any((-3, -2, -1))
+                  | (boxFixed > 1).any((-3, -2, -1)))
+        cand &= fixed | ((rowFixed == 0) & (colFixed == 0) & (boxFixed == 0))
+
+        # hidden singles: a value with one cell left in a unit is the value of that cell
+        rowCount = cand.sum(-2, keepdims=True)
+        colCount = cand.sum(-3, keepdims=True)
+        boxCount = boxCounts(cand, g)
+        hidden = cand & ((rowCount == 1) | (colCount == 1) | (boxCount == 1))
+        hiddenCount = hidden.sum(-1)
+        error |= (hiddenCount > 1).any((-2, -1))
+        cand &= ~(hiddenCount == 1)[..., None] | hidden
+
+        # a cell or a unit without candidates for a value
+        error |= ((cand.sum(-1) == 0).any((-2, -1)) | (rowCount == 0).any((-3, -2, -1))
+                  | (colCount == 0).any((-3, -2, -1)) | (boxCount == 0).any((-3, -2, -1)))
+
+        boxLineReduction(cand, g)
+        now = cand.sum()
+        if now == left:
+            return error
+        left = now
+
+# propagates a list of boards of the same size in lock step as one (K, N, N, N) array,
+# returns (values, solved, error), the values of every board after propagation as 2 dimensional
+# lists, and for each board whether propagation solved it or found it has no solution
+def propagateBoards(boards, g):
+    if numpy is None:
+        raise ImportError("the vectorized engine needs numpy")
+    cand = numpy.stack([candidates(board, g) for board in boards])
+    error = propagate(cand, g)
+    solved = ~error & (cand.sum(-1) == 1).all((-2, -1))
+    return values(cand).tolist(), solved.tolist(), error.tolist()
+
+"------------------------------------------------------------------------------"
+# Backtracking solver on candidate arrays
+#
+# A guess copies the candidate array, which is only N^3 bytes, so there is no
+# trail to undo. The values left to try at a guess stay on the stack with the
+# array they branch from, and a child is only copied when it is tried, the last
+# one takes over the array of its parent.
+class VectorSolver:
+    # the 1 dimensional size of the board
+    size = 0
+    # precomputed box shape for this board size
+    geometry = None
+    # comparator for LCV, None to try values from smallest to largest
+    comparator = None
+    # the board to solve as a 2 dimensional list of values
+    board = None
+    # candidates of the root board, set by setDomains
+    cand = None
+    # the solved candidate array
+    solution = None
+    # number of guesses and backtracks made for the current board
+    guesses = 0
+    backtracks = 0
+
+    def __init__(self, board, size, comparator = None, p = None, q = None):
+        if numpy is None:
+            raise ImportError("the vectorized engine needs numpy")
+        self.size = size
+        self.comparator = comparator
+        if p is None:
+            self.geometry = geometry.geometryForSize(size)
+        else:
+            self.geometry = geometry.getGeometry(p, q)
+        self.reset(board)
+
+    # load a new board, call setDomains() and solve() afterwards as for a new solver
+    def reset(self, board):
+        self.board = board
+        self.cand = None
+        self.solution = None
+        self.guesses = 0
+        self.backtracks = 0
+
+    def setDomains(self):
+        self.cand = candidates(self.board, self.geometry)
+
+    # the candidate values of cell (x, y) in the order they should be tried
+    def orderValues(self, cand, x, y):
+        vals = list(numpy.flatnonzero(cand[x, y]))
+        if self.comparator is None:
+            return vals
+        # number of cells in the row, column and box of (x, y) that can still be each value
+        g = self.geometry
+        box = boxView(cand, g)[x // g.p, :, y // g.q, :, :]
+        counts = cand[x, :, :].sum(0) + cand[:, y, :].sum(0) + box.sum((0, 1))
+        def compare(a, b):
+            if self.comparator(counts[a], counts[b]):
+                return -1
+            if self.comparator(counts[b], counts[a]):
+                return 1
+            return 0
+        return sorted(vals, key=functools.cmp_to_key(compare))
+
+    # the cell with the fewest candidates to branch on, ties go to the cell with the most
+    # unsolved cells in its row, column and box, count is the candidate count of every cell
+    def chooseCell(self, count):
+        g = self.geometry
+        unsolved = count > 1
+        boxes = unsolved.reshape(g.size // g.p, g.p, g.size // g.q, g.q)
+        degree = (unsolved.sum(0, keepdims=True) + unsolved.sum(1, keepdims=True)
+                  + numpy.broadcast_to(boxes.sum((1, 3), keepdims=True), boxes.shape).reshape(count.shape))
+        # degree is below 3*size, so it only decides between cells with the same count
+        key = numpy.where(unsolved, count * 3 * g.size - degree, (g.size + 1) * 3 * g.size)
+        return numpy.unravel_index(key.argmin(), count.shape)
+
+    # depth first search, propagating every candidate array before branching
+    # on the cell with the fewest candidates, returns the solved values or None
+    def solve(self):
+        # (candidate array, x, y, values of (x, y) still to try, last one first)
+        stack = [(self.cand.copy(), None, None, None)]
+        while len(stack) > 0:
+            cand, x, y, vals = stack[-1]
+            if vals is None:
+                stack.pop()
+            else:
+                val = vals.pop()
+                if len(vals) > 0:
+                    cand = cand.copy()
+                else:
+                    stack.pop()
+                cand[x, y, :] = False
+                cand[x, y, val] = True
+            if propagate(cand, self.geometry):
+                self.backtracks += 1
+                continue
+            count = cand.sum(-1)
+            if (count == 1).all():
+                self.solution = cand
+                return self.getValues()
+            x, y = self.chooseCell(count)
+            self.guesses += 1
+            stack.append((cand, x, y, self.orderValues(cand, x, y)[::-1]))
+        return None
+
+    # returns the values on the board as a 2 dimensional list, EMPTY where nothing is known
+    def getValues(self):
+        if self.solution is not None:
+            return values(self.solution).tolist()
+        if self.cand is not None:
+            return values(self.cand).tolist()
+        return [row[:] for row in self.board]
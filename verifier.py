@@ -1,5 +1,4 @@
 import sudoku_solver
-import math
 
 def verify(solver) -> bool:
     # check rows
@@ -19,17 +18,15 @@ def verify(solver) -> bool:
             print(x, y, numbers)
             return False
     # check boxes
-    cellSize = int(math.sqrt(solver.size))
-    for cellX in range(cellSize):
-        for cellY in range(cellSize):
-            numbers = set([i for i in range(1,solver.size+1)])
-            # add up all available variables for this value
-            for x in range(cellX*cellSize, cellX*cellSize+cellSize):
-                for y in range(cellY*cellSize, cellY*cellSize+cellSize):
-                    numbers.discard(solver.board[x][y].value)
-            if len(numbers) > 0:
-                print(x, y, numbers)
-                return False
+    for box in solver.geometry.boxes:
+        numbers = set([i for i in range(1,solver.size+1)])
+        # add up all available variables for this value
+        for i in box:
+            x, y = solver.geometry.positions[i]
+            numbers.discard(solver.board[x][y].value)
+        if len(numbers) > 0:
+            print(x, y, numbers)
+            return False
     # if everything was fine...
     return True
 
@@ -53,16 +50,14 @@ def okSoFar(solver) -> bool:
                 print("col", x,y, solver.board[x][y].value)
                 return False
     # check boxes
-    cellSize = int(math.sqrt(solver.size))
-    for cellX in range(cellSize):
-        for cellY in range(cellSize):
-            numbers = [0 for i in range(0,solver.size+1)]
-            # add up all available variables for this value
-            for x in range(cellX*cellSize, cellX*cellSize+cellSize):
-                for y in range(cellY*cellSize, cellY*cellSize+cellSize):
-                    numbers[solver.board[x][y].value] += 1
-                    if numbers[solver.board[x][y].value] > 1 and solver.board[x][y].value != 0:
-                        print("box", x,y, solver.board[x][y].value)
-                        return False
+    for box in solver.geometry.boxes:
+        numbers = [0 for i in range(0,solver.size+1)]
+        # add up all available variables for this value
+        for i in box:
+            x, y = solver.geometry.positions[i]
+            numbers[solver.board[x][y].value] += 1
+            if numbers[solver.board[x][y].value] > 1 and solver.board[x][y].value != 0:
+                print("box", x,y, solver.board[x][y].value)
+                return False
     # if everything was fine...
     return True